@@ -0,0 +1,4 @@
+"""
+Ax-Shell service benchmarks.
+Run the modules from the Ax-Shell directory, e.g. python -m benchmarks.bench_brightness
+"""
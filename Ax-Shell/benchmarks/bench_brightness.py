@@ -0,0 +1,111 @@
+"""
+Brightness write benchmark.
+
+Simulates a scroll storm on the brightness widget and reports, for each
+write backend, how many writes reach the device per second and the delay
+between a setter call and the matching `screen` signal.
+
+Run from the Ax-Shell directory:
+
+    python -m benchmarks.bench_brightness [--real] [--rate 200] [--seconds 2]
+
+Without --real only the sysfs backend is measured, against a fake backlight
+directory. With --real the logind and brightnessctl backends are driven
+against the best ranked real backlight device too.
+"""
+import argparse
+import statistics
+import tempfile
+import time
+
+from gi.repository import GLib
+
+from benchmarks.fakes import make_fake_backlight
+from services.backlight import SYSFS_CLASS
+from services.brightness import Brightness
+
+
+def run(root: str, backend: str, rate: int, seconds: float) -> dict:
+    service = Brightness(root=root, backend=backend, hotplug=False)
+    writer = service.screen_device._writer
+    writes = 0
+    latencies: list[float] = []
+    oldest_input: float | None = None
+
+    real_write = writer.write
+
+    def counting_write(value):
+        nonlocal writes
+        writes += 1
+        real_write(value)
+
+    writer.write = counting_write
+
+    def on_screen(*_):
+        nonlocal oldest_input
+        if oldest_input is not None:
+            latencies.append((time.perf_counter() - oldest_input) * 1000)
+            oldest_input = None
+
+    service.connect("screen", on_screen)
+
+    loop = GLib.MainLoop()
+    start = time.perf_counter()
+    step = 0
+
+    def feed():
+        nonlocal step, oldest_input
+        if time.perf_counter() - start >= seconds:
+            GLib.timeout_add(100, loop.quit)
+            return False
+        if oldest_input is None:
+            oldest_input = time.perf_counter()
+        step += 1
+        service.screen_brightness = step % service.max_screen
+        return True
+
+    GLib.timeout_add(max(1, 1000 // rate), feed)
+    loop.run()
+    elapsed = time.perf_counter() - start
+    service.registry.close()
+
+    return {
+        "backend": writer.name,
+        "inputs": step,
+        "writes": writes,
+        "writes_per_s": writes / elapsed,
+        "latency_ms_p50": statistics.median(latencies) if latencies else float("nan"),
+        "latency_ms_max": max(latencies, default=float("nan")),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--real", action="store_true")
+    parser.add_argument("--rate", type=int, default=200, help="setter calls per second")
+    parser.add_argument("--seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as root:
+        make_fake_backlight(root)
+        results.append(run(root, "sysfs", args.rate, args.seconds))
+
+    if args.real:
+        for backend in ("logind", "brightnessctl"):
+            results.append(run(SYSFS_CLASS, backend, args.rate, args.seconds))
+
+    print(
+        f"{'backend':<14}{'inputs':>8}{'writes':>8}{'writes/s':>10}"
+        f"{'p50 ms':>9}{'max ms':>9}"
+    )
+    for r in results:
+        print(
+            f"{r['backend']:<14}{r['inputs']:>8}{r['writes']:>8}"
+            f"{r['writes_per_s']:>10.1f}{r['latency_ms_p50']:>9.2f}"
+            f"{r['latency_ms_max']:>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
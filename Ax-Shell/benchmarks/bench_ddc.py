@@ -0,0 +1,61 @@
+"""
+DDC/CI benchmark.
+
+Drives a burst of brightness changes at fake external monitors with slow
+i2c replies and reports how many writes reached the bus and the longest
+stall of the GLib main loop while the burst was in flight.
+
+    python -m benchmarks.bench_ddc [--displays 2] [--burst 100]
+"""
+import argparse
+import time
+
+from gi.repository import GLib
+
+from benchmarks.fakes import FakeDdcBackend
+from services.ddc import DdcBrightness
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--displays", type=int, default=2)
+    parser.add_argument("--burst", type=int, default=100)
+    args = parser.parse_args()
+
+    backend = FakeDdcBackend(displays=args.displays)
+    service = DdcBrightness(backend=backend)
+    loop = GLib.MainLoop()
+    max_gap = 0.0
+    last_tick = time.perf_counter()
+
+    def heartbeat():
+        nonlocal max_gap, last_tick
+        now = time.perf_counter()
+        max_gap = max(max_gap, now - last_tick)
+        last_tick = now
+        return True
+
+    def burst():
+        for i in range(args.burst):
+            for display in service.displays:
+                service.set_brightness(display, i % 101)
+        GLib.timeout_add(1500, loop.quit)
+        return False
+
+    def wait_for_displays(*_):
+        if len(service.displays) == args.displays:
+            GLib.idle_add(burst)
+
+    service.connect("display-added", wait_for_displays)
+    GLib.timeout_add(5, heartbeat)
+    loop.run()
+    service.stop()
+
+    print(f"setter calls      {args.burst * args.displays}")
+    print(f"bus writes        {backend.writes}")
+    print(f"bus reads         {backend.reads}")
+    print(f"max loop stall ms {max_gap * 1000:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Import-time benchmark for the services package.
+
+Imports the package and then each service module in a fresh interpreter
+under `python -X importtime` and reports the cumulative cost of each, along
+with the most expensive modules it pulled in.
+
+    python -m benchmarks.bench_import [--top 5] [--runs 3]
+"""
+import argparse
+import re
+import subprocess
+import sys
+
+from services import SERVICES
+
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def measure(module: str) -> tuple[int, list[tuple[int, str]]]:
+    # Returns the cumulative µs of `module` and its top level imports by cost
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    total = 0
+    children: list[tuple[int, str]] = []
+    for match in LINE.finditer(proc.stderr):
+        _self_us, cumulative, indent, name = match.groups()
+        if name == module:
+            total = int(cumulative)
+        elif name.startswith(("gi.repository.", "fabric", "services.")) and len(indent) <= 3:
+            children.append((int(cumulative), name))
+    if proc.returncode != 0:
+        total = -1
+    return total, sorted(children, reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--top", type=int, default=5)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    modules = ["services"] + [module for module, _ in SERVICES.values()]
+    for module in modules:
+        runs = [measure(module) for _ in range(args.runs)]
+        best, children = min(runs, key=lambda r: r[0])
+        if best < 0:
+            print(f"{module:<22} failed to import (dependency missing?)")
+            continue
+        print(f"{module:<22} {best / 1000:8.1f} ms")
+        for cost, name in children[: args.top]:
+            print(f"    {name:<30} {cost / 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
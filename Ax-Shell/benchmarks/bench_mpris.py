@@ -0,0 +1,68 @@
+"""
+MPRIS signal fan-out benchmark.
+
+Feeds track changes from a fake player into MprisPlayer and counts the
+`changed` emissions, property notifications and idle callbacks each one
+causes once the main loop has settled.
+
+    python -m benchmarks.bench_mpris [--tracks 50]
+"""
+import argparse
+import time
+
+from benchmarks.fakes import FakePlayer, install_fake_typelibs
+
+install_fake_typelibs()
+
+from gi.repository import GLib  # noqa: E402
+
+from services.mpris import MprisPlayer  # noqa: E402
+
+
+def settle():
+    # Run the default main context until nothing is left to dispatch
+    context = GLib.MainContext.default()
+    while context.pending():
+        context.iteration(False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tracks", type=int, default=50)
+    args = parser.parse_args()
+
+    fake = FakePlayer()
+    player = MprisPlayer(fake)
+    settle()
+
+    counts = {"changed": 0, "notify": 0}
+    for signal in counts:
+        player.connect(signal, lambda *_, s=signal: counts.__setitem__(s, counts[s] + 1))
+
+    idle_calls = 0
+    real_idle_add = GLib.idle_add
+
+    def counting_idle_add(*a, **kw):
+        nonlocal idle_calls
+        idle_calls += 1
+        return real_idle_add(*a, **kw)
+
+    GLib.idle_add = counting_idle_add
+    fake.getter_calls = 0
+    start = time.perf_counter()
+    for i in range(args.tracks):
+        fake.change_track(i)
+        settle()
+    elapsed = time.perf_counter() - start
+    GLib.idle_add = real_idle_add
+
+    n = args.tracks
+    print(f"changed emissions per track  {counts['changed'] / n:6.2f}")
+    print(f"property notifies per track  {counts['notify'] / n:6.2f}")
+    print(f"idle callbacks per track     {idle_calls / n:6.2f}")
+    print(f"player getter calls / track  {fake.getter_calls / n:6.2f}")
+    print(f"wall time per track (ms)     {elapsed * 1000 / n:6.3f}")
+
+
+if __name__ == "__main__":
+    main()
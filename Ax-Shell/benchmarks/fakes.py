@@ -0,0 +1,400 @@
+"""
+Local stand-ins for hardware and system services used by the benchmarks.
+
+`install_fake_typelibs` registers fake `Playerctl` and `NM` modules under
+gi.repository when the real typelibs are not installed, so the service
+modules import on a plain headless box.
+"""
+import enum
+import os
+import random
+import sys
+import threading
+import time
+import types
+
+
+class FakeDdcBackend:
+    """Simulates DDC/CI monitors answering slowly over i2c."""
+
+    name = "fake-ddc"
+
+    def __init__(self, displays: int = 2, delay=(0.05, 0.2), maximum: int = 100):
+        self._values = {str(i + 1): maximum // 2 for i in range(displays)}
+        self._max = maximum
+        self._delay = delay
+        self._lock = threading.Lock()
+        self.reads = 0
+        self.writes = 0
+
+    def _wait(self):
+        time.sleep(random.uniform(*self._delay))
+
+    def detect(self) -> list[str]:
+        self._wait()
+        return list(self._values)
+
+    def read(self, display: str) -> tuple[int, int]:
+        self._wait()
+        with self._lock:
+            self.reads += 1
+            return self._values[display], self._max
+
+    def write(self, display: str, value: int):
+        self._wait()
+        with self._lock:
+            self.writes += 1
+            self._values[display] = value
+
+
+class FakeSignals:
+    """Minimal connect/disconnect/emit, enough for the services' handlers."""
+
+    def __init__(self):
+        self._handlers: dict[int, tuple] = {}
+        self._next_id = 1
+        self.emissions = 0
+
+    def connect(self, signal: str, callback, *args) -> int:
+        handler_id = self._next_id
+        self._next_id += 1
+        self._handlers[handler_id] = (signal, callback, args)
+        return handler_id
+
+    def disconnect(self, handler_id: int):
+        self._handlers.pop(handler_id, None)
+
+    def emit(self, signal: str, *args):
+        self.emissions += 1
+        for name, callback, extra in list(self._handlers.values()):
+            if name == signal:
+                callback(self, *args, *extra)
+
+    @property
+    def handler_count(self) -> int:
+        return len(self._handlers)
+
+
+class FakePlayer(FakeSignals):
+    """Stands in for Playerctl.Player, counting every property access."""
+
+    def __init__(self, name: str = "fake", **props):
+        super().__init__()
+        self.props = {
+            "player_name": name,
+            "player_instance": name,
+            "can_control": True,
+            "position": 0,
+            "metadata": {},
+            "shuffle": False,
+            "playback_status": None,
+            "loop_status": None,
+            "can_go_next": True,
+            "can_go_previous": True,
+            "can_seek": True,
+            "can_pause": True,
+            "can_play": True,
+            "volume": 1.0,
+            **props,
+        }
+        self.getter_calls = 0
+        self.setter_calls = 0
+
+    @classmethod
+    def new_from_name(cls, player_name: "FakePlayerName"):
+        return cls(player_name.name)
+
+    def get_property(self, name: str):
+        self.getter_calls += 1
+        return self.props[name.replace("-", "_")]
+
+    def _meta(self, key: str):
+        self.getter_calls += 1
+        return self.props["metadata"].get(key)
+
+    def get_title(self):
+        return self._meta("xesam:title")
+
+    def get_artist(self):
+        return self._meta("xesam:artist")
+
+    def get_album(self):
+        return self._meta("xesam:album")
+
+    def set_shuffle(self, value: bool):
+        self.setter_calls += 1
+        self.props["shuffle"] = value
+
+    def set_loop_status(self, value):
+        self.setter_calls += 1
+        self.props["loop_status"] = value
+
+    def set_position(self, value: int):
+        self.setter_calls += 1
+        self.props["position"] = value
+
+    def play_pause(self):
+        self.setter_calls += 1
+
+    def next(self):
+        self.setter_calls += 1
+
+    def previous(self):
+        self.setter_calls += 1
+
+    def change_track(self, index: int):
+        self.props["metadata"] = {
+            "mpris:trackid": f"/track/{index}",
+            "mpris:length": 180_000_000 + index,
+            "mpris:artUrl": f"file:///tmp/cover-{index}.png",
+            "xesam:title": f"Track {index}",
+            "xesam:artist": [f"Artist {index % 7}"],
+            "xesam:album": f"Album {index % 3}",
+        }
+        self.emit("metadata", self.props["metadata"])
+
+
+class FakePlayerName:
+    def __init__(self, name: str):
+        self.name = name
+        self.instance = name
+
+
+class FakePlayerManager(FakeSignals):
+    """Stands in for Playerctl.PlayerManager, players appear via `appear`."""
+
+    def __init__(self):
+        super().__init__()
+        self.names: list[FakePlayerName] = []
+
+    @classmethod
+    def new(cls):
+        return cls()
+
+    def get_property(self, name: str):
+        return list(self.names)
+
+    def manage_player(self, player):
+        pass
+
+    def appear(self, name: str):
+        player_name = FakePlayerName(name)
+        self.names.append(player_name)
+        self.emit("name-appeared", player_name)
+
+    def vanish(self, name: str):
+        player_name = next(n for n in self.names if n.name == name)
+        self.names.remove(player_name)
+        self.emit("name-vanished", player_name)
+
+
+class FakeAccessPoint(FakeSignals):
+    """Stands in for NM.AccessPoint."""
+
+    def __init__(self, index: int, strength: int = 50):
+        super().__init__()
+        self.bssid = f"02:00:00:00:{index // 256:02x}:{index % 256:02x}"
+        # A few SSIDs shared by many BSSIDs, like a dense office
+        self.ssid = FakeBytes(f"office-{index % 12}".encode())
+        self.strength = strength
+        self.frequency = 2412 if index % 2 else 5180
+        self.last_seen = 1000
+        self.getter_calls = 0
+
+    def _get(self, value):
+        self.getter_calls += 1
+        return value
+
+    def get_bssid(self):
+        return self._get(self.bssid)
+
+    def get_ssid(self):
+        return self._get(self.ssid)
+
+    def get_strength(self):
+        return self._get(self.strength)
+
+    def get_frequency(self):
+        return self._get(self.frequency)
+
+    def get_last_seen(self):
+        return self._get(self.last_seen)
+
+    def get_flags(self):
+        return self._get(0)
+
+    def get_wpa_flags(self):
+        return self._get(0)
+
+    def get_rsn_flags(self):
+        return self._get(0)
+
+    def set_strength(self, strength: int):
+        self.strength = strength
+        self.emit("notify::strength", None)
+
+
+class FakeBytes:
+    def __init__(self, data: bytes):
+        self._data = data
+
+    def get_data(self) -> bytes:
+        return self._data
+
+
+class FakeActiveConnection(FakeSignals):
+    def __init__(self, state):
+        super().__init__()
+        self.state = state
+
+    def get_state(self):
+        return self.state
+
+    def get_connection_type(self):
+        return "802-11-wireless"
+
+
+class FakeDeviceWifi(FakeSignals):
+    """Stands in for NM.DeviceWifi with a configurable number of APs."""
+
+    def __init__(self, access_points: int = 200, iface: str = "wlan0"):
+        super().__init__()
+        from gi.repository import NM as nm
+        self.aps = [FakeAccessPoint(i, 20 + i % 80) for i in range(access_points)]
+        self.active_ap = self.aps[0] if self.aps else None
+        self.active = FakeActiveConnection(nm.ActiveConnectionState.ACTIVATED)
+        self.state = nm.DeviceState.ACTIVATED
+        self.device_type = nm.DeviceType.WIFI
+        self.iface = iface
+        self.getter_calls = 0
+
+    def _get(self, value):
+        self.getter_calls += 1
+        return value
+
+    def get_access_points(self):
+        return self._get(list(self.aps))
+
+    def get_active_access_point(self):
+        return self._get(self.active_ap)
+
+    def get_active_connection(self):
+        return self._get(self.active)
+
+    def get_state(self):
+        return self._get(self.state)
+
+    def get_device_type(self):
+        return self._get(self.device_type)
+
+    def get_iface(self):
+        return self._get(self.iface)
+
+    def get_last_scan(self):
+        return self._get(1000)
+
+    def request_scan_async(self, cancellable, callback, *args):
+        callback(self, None, *args)
+
+    def request_scan_finish(self, result):
+        return True
+
+
+class FakeClient(FakeSignals):
+    """Stands in for NM.Client."""
+
+    def __init__(self, devices=()):
+        super().__init__()
+        self.devices = list(devices)
+        self.wireless_enabled = True
+
+    def get_devices(self):
+        return list(self.devices)
+
+    def wireless_get_enabled(self):
+        return self.wireless_enabled
+
+    def wireless_set_enabled(self, value: bool):
+        self.wireless_enabled = value
+        self.emit("notify::wireless-enabled", None)
+
+    def get_primary_connection(self):
+        return self.devices[0].active if self.devices else None
+
+
+def _fake_playerctl() -> types.ModuleType:
+    module = types.ModuleType("gi.repository.Playerctl")
+    module.PlaybackStatus = enum.IntEnum("PlaybackStatus", "PLAYING PAUSED STOPPED", start=0)
+    module.LoopStatus = enum.IntEnum("LoopStatus", "NONE TRACK PLAYLIST", start=0)
+    module.Player = FakePlayer
+    module.PlayerName = FakePlayerName
+    module.PlayerManager = FakePlayerManager
+    return module
+
+
+def _fake_nm() -> types.ModuleType:
+    module = types.ModuleType("gi.repository.NM")
+    module.ActiveConnectionState = enum.IntEnum(
+        "ActiveConnectionState", "UNKNOWN ACTIVATING ACTIVATED DEACTIVATING DEACTIVATED", start=0
+    )
+    module.DeviceState = enum.IntEnum(
+        "DeviceState",
+        "UNKNOWN UNMANAGED UNAVAILABLE DISCONNECTED PREPARE CONFIG NEED_AUTH "
+        "IP_CONFIG IP_CHECK SECONDARIES ACTIVATED DEACTIVATING FAILED",
+        start=0,
+    )
+    module.DeviceType = enum.IntEnum("DeviceType", "UNKNOWN ETHERNET WIFI", start=0)
+    module.ConnectivityState = enum.IntEnum(
+        "ConnectivityState", "UNKNOWN NONE PORTAL LIMITED FULL", start=0
+    )
+    module.ActiveConnectionStateReason = enum.IntEnum(
+        "ActiveConnectionStateReason",
+        "UNKNOWN NONE USER_DISCONNECTED DEVICE_DISCONNECTED",
+        start=0,
+    )
+    module.Client = FakeClient
+    module.ActiveConnection = FakeActiveConnection
+    module.RemoteConnection = FakeSignals
+    module.SimpleConnection = FakeSignals
+    module.SettingWirelessSecurity = FakeSignals
+    module.Device = FakeSignals
+    module.DeviceWifi = FakeDeviceWifi
+    module.DeviceEthernet = FakeSignals
+    module.AccessPoint = FakeAccessPoint
+    module.utils_ssid_to_utf8 = lambda data: bytes(data).decode(errors="replace")
+    return module
+
+
+def install_fake_typelibs():
+    """Use fake Playerctl/NM modules for whichever typelib is missing."""
+    import gi
+    import gi.repository
+
+    real_require_version = gi.require_version
+    fakes = {"Playerctl": _fake_playerctl, "NM": _fake_nm}
+    installed = set()
+    for name, factory in fakes.items():
+        try:
+            real_require_version(name, {"Playerctl": "2.0", "NM": "1.0"}[name])
+        except ValueError:
+            module = factory()
+            sys.modules[f"gi.repository.{name}"] = module
+            setattr(gi.repository, name, module)
+            installed.add(name)
+
+    def require_version(namespace, version):
+        if namespace not in installed:
+            real_require_version(namespace, version)
+
+    gi.require_version = require_version
+    return installed
+
+
+def make_fake_backlight(root: str, max_brightness: int = 255, name="fake_backlight"):
+    """Create a sysfs-like backlight device under `root`/backlight."""
+    path = os.path.join(root, "backlight", name)
+    os.makedirs(path)
+    attributes = (("max_brightness", max_brightness), ("brightness", 0), ("type", "raw"))
+    for attribute, value in attributes:
+        with open(os.path.join(path, attribute), "w") as f:
+            f.write(f"{value}\n")
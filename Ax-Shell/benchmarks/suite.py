@@ -0,0 +1,207 @@
+"""
+Headless benchmark suite for the services.
+
+Drives bursts of events through the services with fake Playerctl players,
+a fake NetworkManager client and a sysfs-like backlight directory, and
+reports per event: idle and timeout sources queued, signals emitted,
+property notifications, getter calls on the fakes and wall time.
+
+    python -m benchmarks.suite [--scenario NAME] [--json]
+"""
+import argparse
+import json
+import tempfile
+import time
+
+from benchmarks.fakes import (
+    FakeClient,
+    FakeDeviceWifi,
+    FakePlayer,
+    install_fake_typelibs,
+    make_fake_backlight,
+)
+
+install_fake_typelibs()
+
+from gi.repository import GLib  # noqa: E402
+
+
+def settle(ms: int = 0):
+    # Runs the main loop for `ms` and then until nothing is ready to dispatch
+    if ms:
+        loop = GLib.MainLoop()
+        GLib.timeout_add(ms, loop.quit)
+        loop.run()
+    context = GLib.MainContext.default()
+    while context.pending():
+        context.iteration(False)
+
+
+class Probe:
+    """Counts main-loop sources and service emissions while active."""
+
+    def __init__(self, *services):
+        self._services = services
+        self.counts = {"idle": 0, "timeout": 0, "signals": 0, "notifies": 0}
+
+    def _counting(self, key: str, func):
+        def wrapper(*args, **kwargs):
+            self.counts[key] += 1
+            return func(*args, **kwargs)
+
+        return wrapper
+
+    def __enter__(self):
+        self._idle_add, self._timeout_add = GLib.idle_add, GLib.timeout_add
+        GLib.idle_add = self._counting("idle", self._idle_add)
+        GLib.timeout_add = self._counting("timeout", self._timeout_add)
+        for service in self._services:
+            service.emit = self._counting("signals", service.emit)
+            service.notify = self._counting("notifies", service.notify)
+        return self
+
+    def __exit__(self, *exc):
+        GLib.idle_add, GLib.timeout_add = self._idle_add, self._timeout_add
+        for service in self._services:
+            del service.emit
+            del service.notify
+
+
+def mpris_track_change(events: int = 50) -> dict:
+    from services.mpris import MprisPlayer
+
+    fake = FakePlayer()
+    player = MprisPlayer(fake)
+    # A widget that re-renders the track on every change
+    player.connect("changed", lambda p, *_: (p.title, p.artist, p.arturl, p.length))
+    settle()
+
+    fake.getter_calls = 0
+    with Probe(player) as probe:
+        start = time.perf_counter()
+        for i in range(events):
+            fake.change_track(i)
+            settle()
+        elapsed = time.perf_counter() - start
+    return {**probe.counts, "getters": fake.getter_calls, "events": events, "wall": elapsed}
+
+
+def mpris_player_churn(events: int = 50) -> dict:
+    from services.mpris import MprisPlayerManager
+
+    manager = MprisPlayerManager()
+    fake = manager._manager
+    announced = []
+    manager.connect(
+        "notify::active-player",
+        lambda m, *_: announced.append(m.active_player and m.active_player.player_name),
+    )
+
+    with Probe(manager) as probe:
+        start = time.perf_counter()
+        for i in range(events):
+            # A player starting while no other one is running must become
+            # the active player, and say so
+            fake.appear(f"player{i}")
+            settle()
+            if announced[-1:] != [f"player{i}"]:
+                raise AssertionError(f"player{i} was not announced as active")
+            fake.vanish(f"player{i}")
+            settle()
+        elapsed = time.perf_counter() - start
+    return {**probe.counts, "getters": len(announced), "events": events, "wall": elapsed}
+
+
+def wifi_strength_storm(access_points: int = 200, rounds: int = 5) -> dict:
+    from services.network import Wifi
+
+    device = FakeDeviceWifi(access_points)
+    client = FakeClient([device])
+    wifi = Wifi(client, device)
+    # The bar icon re-renders on `changed`, the network menu on the list notify
+    wifi.connect("changed", lambda w, *_: w.icon_name)
+    wifi.connect("notify::access-points", lambda w, *_: w.access_points)
+    settle()
+
+    def getter_calls():
+        return device.getter_calls + sum(ap.getter_calls for ap in device.aps)
+
+    baseline = getter_calls()
+    with Probe(wifi) as probe:
+        start = time.perf_counter()
+        for r in range(rounds):
+            # Settling per event keeps per-update fan-out from being folded
+            for i, ap in enumerate(device.aps):
+                ap.set_strength((i * 7 + r * 13) % 100)
+                settle()
+        elapsed = time.perf_counter() - start
+    return {
+        **probe.counts,
+        "getters": getter_calls() - baseline,
+        "events": access_points * rounds,
+        "wall": elapsed,
+    }
+
+
+def brightness_scroll_storm(events: int = 500) -> dict:
+    from services.brightness import Brightness
+
+    with tempfile.TemporaryDirectory() as root:
+        make_fake_backlight(root)
+        service = Brightness(root=root, hotplug=False)
+        device = service.screen_device
+        writes = 0
+        real_write = device._writer.write
+
+        def counting_write(value):
+            nonlocal writes
+            writes += 1
+            real_write(value)
+
+        device._writer.write = counting_write
+        service.connect("screen", lambda *_: service.screen_brightness)
+        settle()
+
+        with Probe(service, device) as probe:
+            start = time.perf_counter()
+            for i in range(events):
+                service.screen_brightness = i % device.max_brightness
+                if i % 10 == 0:
+                    settle(1)
+            settle(2 * 16)
+            elapsed = time.perf_counter() - start
+        service.registry.close()
+    return {**probe.counts, "getters": writes, "events": events, "wall": elapsed}
+
+
+SCENARIOS = {
+    "mpris-track-change": mpris_track_change,
+    "mpris-player-churn": mpris_player_churn,
+    "wifi-strength-200-aps": wifi_strength_storm,
+    "brightness-scroll-storm": brightness_scroll_storm,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scenario", choices=SCENARIOS, action="append")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    results = {name: SCENARIOS[name]() for name in args.scenario or SCENARIOS}
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    # Brightness reports kernel writes in the getter column, player churn the
+    # active-player announcements
+    columns = ("idle", "timeout", "signals", "notifies", "getters")
+    print(f"{'scenario':<26}{'events':>7}" + "".join(f"{c:>10}" for c in columns) + f"{'µs':>10}")
+    for name, r in results.items():
+        n = r["events"]
+        row = "".join(f"{r[c] / n:>10.2f}" for c in columns)
+        print(f"{name:<26}{n:>7}{row}{r['wall'] * 1e6 / n:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
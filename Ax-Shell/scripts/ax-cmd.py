@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Send a command to the Ax-Shell services process (python -m services.ipc).
+
+    ax-cmd.py brightness.step 5
+    ax-cmd.py mpris.play_pause
+
+With no arguments, commands are read line by line from stdin over a single
+connection, e.g. from a key daemon that stays running.
+
+Only the standard library is imported; for the cheapest keybind use the
+socat one-liner in services/ipc.py instead.
+"""
+import os
+import socket
+import sys
+
+# Like the server, never look for the socket outside the private runtime dir
+SOCKET_PATH = os.path.join(os.environ["XDG_RUNTIME_DIR"], "ax-shell", "state.sock")
+
+
+def main():
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(SOCKET_PATH)
+        if len(sys.argv) > 1:
+            sock.sendall((" ".join(sys.argv[1:]) + "\n").encode())
+            return
+        for line in sys.stdin:
+            sock.sendall(line.encode())
+
+
+if __name__ == "__main__":
+    main()
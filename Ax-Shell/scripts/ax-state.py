@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Waybar custom module fed by the Ax-Shell state socket (python -m services.ipc).
+
+It stays connected and prints one JSON line per change, so waybar never forks
+per update. Only the standard library is used.
+
+    "custom/brightness": {
+        "exec": "~/.config/Ax-Shell/scripts/ax-state.py brightness '󰃠 {screen}%'",
+        "return-type": "json"
+    },
+    "custom/media": {
+        "exec": "~/.config/Ax-Shell/scripts/ax-state.py media '{artist} - {title}'",
+        "return-type": "json"
+    }
+
+Nested values are indexed, e.g. '{wifi[ssid]}'; missing fields render empty.
+"""
+import json
+import os
+import socket
+import sys
+import time
+
+# Like the server, never look for the socket outside the private runtime dir
+SOCKET_PATH = os.path.join(os.environ["XDG_RUNTIME_DIR"], "ax-shell", "state.sock")
+
+
+class Fields(dict):
+    def __missing__(self, key):
+        return ""
+
+
+def render(template: str, state: dict) -> str:
+    try:
+        return template.format_map(Fields(state))
+    except (LookupError, TypeError):
+        # e.g. '{wifi[ssid]}' while there is no Wi-Fi device
+        return ""
+
+
+def stream(topic: str):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(SOCKET_PATH)
+        sock.sendall(f"subscribe {topic}\n".encode())
+        state = {}
+        for line in sock.makefile(encoding="utf-8"):
+            message = json.loads(line)
+            if message.get("topic") != topic:
+                continue
+            state.update(message.get("snapshot") or message.get("diff") or {})
+            yield state
+
+
+def main():
+    topic = sys.argv[1]
+    template = sys.argv[2] if len(sys.argv) > 2 else ""
+    while True:
+        try:
+            for state in stream(topic):
+                print(
+                    json.dumps(
+                        {
+                            "text": render(template, state),
+                            "tooltip": json.dumps(state, indent=1),
+                            "class": topic,
+                        }
+                    ),
+                    flush=True,
+                )
+        except OSError:
+            pass
+        # The services process went away, wait for it to come back
+        time.sleep(2)
+
+
+if __name__ == "__main__":
+    main()
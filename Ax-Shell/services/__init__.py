@@ -1,4 +1,73 @@
 """
 Ax-Shell services package.
 Contains background services and utilities for the shell.
+
+Services are loaded lazily through `get`, so a service's module and the GI
+typelibs behind it (Playerctl, NM, ...) are only imported the first time
+something asks for it. A service whose optional dependency is missing is
+disabled and `get` returns None for it.
+
+Set AX_SHELL_TRACE=1 to turn on main-loop instrumentation, see
+`services.instrument`.
 """
+import importlib
+import os
+from functools import reduce
+
+from loguru import logger
+
+# name -> (module, dotted path of the factory inside it)
+SERVICES = {
+    "brightness": ("services.brightness", "Brightness.get_initial"),
+    "mpris": ("services.mpris", "MprisPlayerManager"),
+    "art": ("services.art", "ArtCache.get_initial"),
+    "network": ("services.network", "NetworkClient"),
+    "traffic": ("services.traffic", "TrafficMonitor.get_initial"),
+    "cava": ("services.cava", "Cava.get_initial"),
+    "wallpapers": ("services.wallpapers", "WallpaperCatalog.get_initial"),
+}
+
+if os.environ.get("AX_SHELL_TRACE"):
+    from services import instrument
+
+    instrument.install()
+
+_instances: dict = {}
+_disabled: dict[str, str] = {}
+
+
+def get(name: str):
+    """Return the shared instance of a service, loading it on first use."""
+    if name in _instances:
+        return _instances[name]
+    if name in _disabled:
+        return None
+
+    module_name, factory = SERVICES[name]
+    try:
+        module = importlib.import_module(module_name)
+    except (ImportError, ValueError) as e:
+        # gi.require_version raises ValueError for a missing typelib
+        _disabled[name] = str(e)
+        logger.warning(f"[Services] {name} disabled: {e}")
+        return None
+
+    _instances[name] = instance = reduce(getattr, factory.split("."), module)()
+    return instance
+
+
+def available(name: str) -> bool:
+    """Whether a service can be used, without instantiating it."""
+    if name in _instances:
+        return True
+    if name not in _disabled:
+        try:
+            importlib.import_module(SERVICES[name][0])
+        except (ImportError, ValueError) as e:
+            _disabled[name] = str(e)
+    return name not in _disabled
+
+
+def disabled() -> dict[str, str]:
+    """Services turned off so far, with the reason."""
+    return dict(_disabled)
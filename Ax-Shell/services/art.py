@@ -0,0 +1,196 @@
+import base64
+import hashlib
+import os
+import threading
+import time
+import urllib.parse
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import gi
+from fabric.core.service import Service, Signal
+from gi.repository import GLib
+from loguru import logger
+
+gi.require_version("GdkPixbuf", "2.0")
+from gi.repository import GdkPixbuf  # noqa: E402
+
+CACHE_DIR = os.path.join(GLib.get_user_cache_dir(), "ax-shell", "art")
+
+# Decoded pixbufs kept in memory, in bytes
+MEMORY_LIMIT = 32 * 1024 * 1024
+
+WORKERS = 2
+
+# Seconds a URL that failed to load is not tried again, and how many such
+# URLs are remembered
+FAILURE_RETRY = 60
+FAILURE_LIMIT = 64
+
+
+def load_url(
+    url: str, cache_dir: str = CACHE_DIR, fetch_remote: bool = True
+) -> bytes | None:
+    # Resolves an MPRIS artUrl to the raw image bytes. Runs on a worker.
+    scheme = urllib.parse.urlsplit(url).scheme
+    if scheme == "file":
+        with open(urllib.parse.unquote(urllib.parse.urlsplit(url).path), "rb") as f:
+            return f.read()
+    if scheme == "data":
+        header, _, payload = url.partition(",")
+        if header.endswith(";base64"):
+            return base64.b64decode(payload)
+        return urllib.parse.unquote_to_bytes(payload)
+    if scheme in ("http", "https") and fetch_remote:
+        remote_path = os.path.join(
+            cache_dir, "remote", hashlib.sha256(url.encode()).hexdigest()
+        )
+        if os.path.exists(remote_path):
+            with open(remote_path, "rb") as f:
+                return f.read()
+        with urllib.request.urlopen(url, timeout=10) as response:
+            data = response.read()
+        os.makedirs(os.path.dirname(remote_path), exist_ok=True)
+        partial = f"{remote_path}.{threading.get_ident()}.tmp"
+        with open(partial, "wb") as f:
+            f.write(data)
+        os.replace(partial, remote_path)
+        return data
+    return None
+
+
+def decode_scaled(data: bytes, size: int) -> GdkPixbuf.Pixbuf:
+    # Decodes and scales to fit a size x size box, keeping the aspect ratio
+    loader = GdkPixbuf.PixbufLoader()
+    loader.write(data)
+    loader.close()
+    pixbuf = loader.get_pixbuf()
+    width, height = pixbuf.get_width(), pixbuf.get_height()
+    scale = size / max(width, height)
+    if scale >= 1:
+        return pixbuf
+    return pixbuf.scale_simple(
+        max(1, round(width * scale)),
+        max(1, round(height * scale)),
+        GdkPixbuf.InterpType.BILINEAR,
+    )
+
+
+class ArtCache(Service):
+    """A service loading album art off the main loop, with memory and disk caches."""
+
+    instance = None
+
+    @staticmethod
+    def get_initial():
+        if ArtCache.instance is None:
+            ArtCache.instance = ArtCache()
+
+        return ArtCache.instance
+
+    @Signal
+    def ready(self, url: str, size: int, pixbuf: object) -> None: ...
+
+    @Signal
+    def failed(self, url: str, size: int) -> None: ...
+
+    def __init__(
+        self,
+        memory_limit: int = MEMORY_LIMIT,
+        cache_dir: str = CACHE_DIR,
+        fetch_remote: bool = True,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self._memory_limit = memory_limit
+        self._memory_used = 0
+        self._lru: OrderedDict[tuple[str, int], GdkPixbuf.Pixbuf] = OrderedDict()
+        self._in_flight: set[tuple[str, int]] = set()
+        # (url, size) -> when it last failed, oldest first
+        self._failed: OrderedDict[tuple[str, int], float] = OrderedDict()
+        self._cache_dir = cache_dir
+        self._fetch_remote = fetch_remote
+        self._pool = ThreadPoolExecutor(WORKERS, thread_name_prefix="art")
+
+    def lookup(self, url: str, size: int) -> GdkPixbuf.Pixbuf | None:
+        key = (url, size)
+        pixbuf = self._lru.get(key)
+        if pixbuf is not None:
+            self._lru.move_to_end(key)
+        return pixbuf
+
+    def request(self, url: str | None, size: int) -> GdkPixbuf.Pixbuf | None:
+        """Return the art if it is cached, otherwise load it and emit `ready`.
+
+        A load that fails emits `failed`, and the same URL is not tried
+        again for FAILURE_RETRY seconds.
+        """
+        if not url:
+            return None
+        pixbuf = self.lookup(url, size)
+        if pixbuf is not None:
+            return pixbuf
+        key = (url, size)
+        failed_at = self._failed.get(key)
+        if failed_at is not None and time.monotonic() - failed_at < FAILURE_RETRY:
+            return None
+        if key not in self._in_flight:
+            self._in_flight.add(key)
+            self._pool.submit(self._load, url, size)
+        return None
+
+    def _load(self, url: str, size: int):
+        pixbuf = None
+        try:
+            data = load_url(url, self._cache_dir, self._fetch_remote)
+            if data is not None:
+                pixbuf = self._load_scaled(data, size)
+        except Exception as e:
+            logger.warning(f"[ArtCache] Failed to load {url}: {e}")
+        GLib.idle_add(self._deliver, url, size, pixbuf)
+
+    def _load_scaled(self, data: bytes, size: int) -> GdkPixbuf.Pixbuf:
+        # Scaled copies on disk are keyed by the content, so the same cover
+        # reached through different URLs is decoded only once
+        digest = hashlib.sha256(data).hexdigest()[:32]
+        path = os.path.join(self._cache_dir, f"{digest}-{size}.png")
+        if os.path.exists(path):
+            return GdkPixbuf.Pixbuf.new_from_file(path)
+        pixbuf = decode_scaled(data, size)
+        os.makedirs(self._cache_dir, exist_ok=True)
+        # Both workers may be saving the same cover, never expose a partial file
+        partial = f"{path}.{threading.get_ident()}.tmp"
+        pixbuf.savev(partial, "png", [], [])
+        os.replace(partial, path)
+        return pixbuf
+
+    def _deliver(self, url: str, size: int, pixbuf: GdkPixbuf.Pixbuf | None):
+        key = (url, size)
+        self._in_flight.discard(key)
+        if pixbuf is None:
+            self._failed.pop(key, None)
+            self._failed[key] = time.monotonic()
+            if len(self._failed) > FAILURE_LIMIT:
+                self._failed.popitem(last=False)
+            self.emit("failed", url, size)
+            return False
+        self._failed.pop(key, None)
+        self._store(key, pixbuf)
+        self.emit("ready", url, size, pixbuf)
+        return False
+
+    def _store(self, key: tuple[str, int], pixbuf: GdkPixbuf.Pixbuf):
+        previous = self._lru.pop(key, None)
+        if previous is not None:
+            self._memory_used -= previous.get_byte_length()
+        self._lru[key] = pixbuf
+        self._memory_used += pixbuf.get_byte_length()
+        while self._memory_used > self._memory_limit and len(self._lru) > 1:
+            _, evicted = self._lru.popitem(last=False)
+            self._memory_used -= evicted.get_byte_length()
+
+    def clear(self):
+        self._lru.clear()
+        self._failed.clear()
+        self._memory_used = 0
@@ -0,0 +1,463 @@
+import math
+import os
+import socket
+import time
+
+from fabric.core.service import Property, Service, Signal
+from fabric.utils import exec_shell_command_async, monitor_file
+from gi.repository import Gio, GLib
+from loguru import logger
+
+import utils.functions as helpers
+from utils.colors import Colors
+
+SYSFS_CLASS = "/sys/class"
+
+# One kernel write and one signal per frame at most, the last value wins
+FRAME_INTERVAL_MS = 16
+
+# Lower ranks are preferred when picking the screen backlight
+BACKLIGHT_RANK = {"firmware": 0, "platform": 1, "raw": 2}
+
+NETLINK_KOBJECT_UEVENT = 15
+
+# Easing curves for fades, mapping progress in [0, 1] to [0, 1]
+FADE_CURVES = {
+    "linear": lambda t: t,
+    "ease-in": lambda t: t * t,
+    "ease-out": lambda t: 1 - (1 - t) * (1 - t),
+    "ease-in-out": lambda t: 0.5 - math.cos(math.pi * t) / 2,
+}
+
+
+def exec_brightnessctl_async(args: str):
+    if not helpers.executable_exists("brightnessctl"):
+        logger.error(f"{Colors.ERROR}Command brightnessctl not found")
+
+    exec_shell_command_async(f"brightnessctl {args}", lambda _: None)
+
+
+def read_attribute(path: str, name: str) -> str | None:
+    try:
+        fd = os.open(os.path.join(path, name), os.O_RDONLY)
+    except OSError:
+        return None
+    try:
+        return os.pread(fd, 64, 0).decode().strip()
+    finally:
+        os.close(fd)
+
+
+def is_wanted(subsystem: str, name: str) -> bool:
+    # Every backlight, but only keyboard backlights out of all the LEDs
+    return subsystem == "backlight" or "kbd_backlight" in name
+
+
+class SysfsWriter:
+    """Writes brightness straight to the sysfs attribute of the device."""
+
+    name = "sysfs"
+
+    def __init__(self, path: str):
+        self._fd = os.open(os.path.join(path, "brightness"), os.O_WRONLY)
+
+    @staticmethod
+    def available(path: str) -> bool:
+        return os.access(os.path.join(path, "brightness"), os.W_OK)
+
+    def write(self, value: int):
+        os.pwrite(self._fd, str(value).encode(), 0)
+
+    def close(self):
+        os.close(self._fd)
+
+
+class LogindWriter:
+    """Writes brightness through logind's Session.SetBrightness D-Bus method."""
+
+    name = "logind"
+
+    def __init__(self, subsystem: str, device: str):
+        self._subsystem = subsystem
+        self._device = device
+        self._bus = Gio.bus_get_sync(Gio.BusType.SYSTEM, None)
+
+    @staticmethod
+    def available() -> bool:
+        # logind resolves the "auto" session from the caller, so we need to be in one
+        return bool(os.environ.get("XDG_SESSION_ID"))
+
+    def write(self, value: int):
+        self._bus.call(
+            "org.freedesktop.login1",
+            "/org/freedesktop/login1/session/auto",
+            "org.freedesktop.login1.Session",
+            "SetBrightness",
+            GLib.Variant("(ssu)", (self._subsystem, self._device, value)),
+            None,
+            Gio.DBusCallFlags.NONE,
+            -1,
+            None,
+            self._on_done,
+        )
+
+    def _on_done(self, bus: Gio.DBusConnection, result: Gio.AsyncResult):
+        try:
+            bus.call_finish(result)
+        except GLib.Error as e:
+            logger.error(f"{Colors.ERROR}logind SetBrightness failed: {e.message}")
+
+    def close(self):
+        pass
+
+
+class BrightnessctlWriter:
+    """Fallback writer spawning brightnessctl for every write."""
+
+    name = "brightnessctl"
+
+    def __init__(self, device: str):
+        self._device = device
+
+    def write(self, value: int):
+        exec_brightnessctl_async(f"--device '{self._device}' set {value}")
+
+    def close(self):
+        pass
+
+
+def make_writer(subsystem: str, device: str, path: str, backend: str | None = None):
+    # Picks the cheapest backend that can write to the device,
+    # unless a specific one is requested.
+    if backend in (None, "sysfs") and SysfsWriter.available(path):
+        return SysfsWriter(path)
+    if backend in (None, "logind") and (backend or LogindWriter.available()):
+        try:
+            return LogindWriter(subsystem, device)
+        except GLib.Error as e:
+            logger.warning(f"{Colors.WARNING}logind unavailable: {e.message}")
+    return BrightnessctlWriter(device)
+
+
+class FrameThrottle:
+    """Runs a callback at most once per frame.
+
+    The first call runs right away, further calls within the same frame are
+    merged into a single trailing run.
+    """
+
+    def __init__(self, callback):
+        self._callback = callback
+        self._dirty = False
+        self._source_id: int | None = None
+
+    def __call__(self):
+        self._dirty = True
+        if self._source_id is None:
+            self._run()
+            self._source_id = GLib.timeout_add(FRAME_INTERVAL_MS, self._on_frame)
+
+    def _on_frame(self) -> bool:
+        if not self._dirty:
+            self._source_id = None
+            return False
+        self._run()
+        return True
+
+    def _run(self):
+        self._dirty = False
+        self._callback()
+
+    def cancel(self):
+        if self._source_id is not None:
+            GLib.source_remove(self._source_id)
+            self._source_id = None
+        self._dirty = False
+
+
+class BacklightDevice(Service):
+    """A single backlight or LED device with cached reads and merged writes."""
+
+    @Signal
+    def changed(self, percent: int) -> None: ...
+
+    def __init__(
+        self,
+        subsystem: str,
+        name: str,
+        root: str = SYSFS_CLASS,
+        backend: str | None = None,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self.subsystem = subsystem
+        self.name = name
+        self.path = os.path.join(root, subsystem, name)
+        self.kind = (
+            read_attribute(self.path, "type") if subsystem == "backlight" else "led"
+        )
+        self.max_brightness = int(read_attribute(self.path, "max_brightness") or 0)
+
+        # Keep the attribute open, reads are a single pread on change
+        self._read_fd = os.open(os.path.join(self.path, "brightness"), os.O_RDONLY)
+        self._raw = self._read()
+        self._published = self.percent
+
+        self._writer = make_writer(subsystem, name, self.path, backend)
+        self._pending: int | None = None
+        self._fade_id: int | None = None
+        self._write_throttle = FrameThrottle(self._do_write)
+        self._emit_throttle = FrameThrottle(self._do_emit)
+
+        # uevents are the primary change source, inotify is kept for drivers
+        # that do notify the attribute
+        self._monitor = monitor_file(os.path.join(self.path, "brightness"))
+        self._monitor.connect("changed", lambda *_: self.refresh())
+
+    @property
+    def rank(self) -> int:
+        return BACKLIGHT_RANK.get(self.kind, len(BACKLIGHT_RANK))
+
+    @property
+    def writer_name(self) -> str:
+        return self._writer.name
+
+    def _read(self) -> int:
+        try:
+            return int(os.pread(self._read_fd, 32, 0))
+        except (OSError, ValueError) as e:
+            logger.warning(f"{Colors.WARNING}Failed to read {self.name}: {e}")
+            return -1
+
+    def refresh(self):
+        value = self._read()
+        if value != self._raw:
+            self._raw = value
+            self._emit_throttle()
+
+    def _do_emit(self):
+        percent = self.percent
+        if percent != self._published:
+            self._published = percent
+            self.emit("changed", percent)
+            self.notify("raw")
+
+    def _do_write(self):
+        value, self._pending = self._pending, None
+        if value is None:
+            return
+        try:
+            self._writer.write(value)
+            self._raw = value
+            self._emit_throttle()
+        except GLib.Error as e:
+            logger.error(f"{Colors.ERROR}Error setting {self.name}: {e.message}")
+        except Exception as e:
+            logger.exception(f"Unexpected error setting {self.name}: {e}")
+
+    def _queue_write(self, value: int):
+        self._pending = max(0, min(value, self.max_brightness))
+        self._write_throttle()
+
+    def set_raw(self, value: int):
+        self.cancel_fade()
+        self._queue_write(value)
+
+    def set_percent(self, percent: int):
+        self.set_raw(round(percent * self.max_brightness / 100))
+
+    def step_percent(self, delta: int):
+        """Move by `delta` percent from the last requested value."""
+        if not delta:
+            return
+        # Key repeat outruns the frame throttle, so base the step on the
+        # pending write or the value rapid steps would stall on a stale read
+        base = self._pending if self._pending is not None else self._raw
+        step = round(delta * self.max_brightness / 100) or (1 if delta > 0 else -1)
+        self.set_raw(base + step)
+
+    def fade_to(self, value: int, duration_ms: int = 250, curve="ease-out"):
+        """Fade to the raw `value`, cancelling any running fade."""
+        self.cancel_fade()
+        ease = FADE_CURVES[curve] if isinstance(curve, str) else curve
+        start_value = self._pending if self._pending is not None else self._raw
+        target = max(0, min(value, self.max_brightness))
+        if duration_ms <= 0 or start_value == target:
+            self._queue_write(target)
+            return
+
+        started = time.monotonic()
+        last_raw = start_value
+
+        def tick() -> bool:
+            nonlocal last_raw
+            progress = min(1.0, (time.monotonic() - started) * 1000 / duration_ms)
+            raw = round(start_value + (target - start_value) * ease(progress))
+            # Small max_brightness devices land on the same raw value for many ticks
+            if raw != last_raw:
+                last_raw = raw
+                self._queue_write(raw)
+            if progress >= 1.0:
+                self._fade_id = None
+                return False
+            return True
+
+        self._fade_id = GLib.timeout_add(FRAME_INTERVAL_MS, tick)
+
+    def cancel_fade(self):
+        if self._fade_id is not None:
+            GLib.source_remove(self._fade_id)
+            self._fade_id = None
+
+    def close(self):
+        self.cancel_fade()
+        self._write_throttle.cancel()
+        self._emit_throttle.cancel()
+        self._monitor.cancel()
+        self._writer.close()
+        os.close(self._read_fd)
+
+    @Property(int, "readable")
+    def raw(self) -> int:
+        return self._raw
+
+    @Property(int, "readable")
+    def percent(self) -> int:
+        if self._raw < 0 or self.max_brightness <= 0:
+            return -1
+        return round(self._raw * 100 / self.max_brightness)
+
+
+class UeventMonitor:
+    """Listens to kernel uevents on a netlink socket from the GLib main loop."""
+
+    def __init__(self, subsystems: tuple[str, ...], callback):
+        self._subsystems = subsystems
+        self._callback = callback
+        self._sock = socket.socket(
+            socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_KOBJECT_UEVENT
+        )
+        self._sock.setblocking(False)
+        # Multicast group 1 carries the kernel's own events
+        self._sock.bind((0, 1))
+        self._watch_id = GLib.io_add_watch(
+            self._sock.fileno(), GLib.PRIORITY_DEFAULT, GLib.IO_IN, self._on_readable
+        )
+
+    def _on_readable(self, *_) -> bool:
+        while True:
+            try:
+                data = self._sock.recv(8192)
+            except BlockingIOError:
+                return True
+            except OSError as e:
+                logger.warning(f"{Colors.WARNING}uevent socket failed: {e}")
+                return False
+            env = dict(
+                field.split("=", 1)
+                for field in data.decode(errors="replace").split("\0")
+                if "=" in field
+            )
+            subsystem = env.get("SUBSYSTEM")
+            if subsystem in self._subsystems and "DEVPATH" in env:
+                self._callback(
+                    env.get("ACTION", ""), subsystem, os.path.basename(env["DEVPATH"])
+                )
+
+    def close(self):
+        GLib.source_remove(self._watch_id)
+        self._sock.close()
+
+
+class BacklightRegistry(Service):
+    """Keeps track of backlight and keyboard LED devices as they come and go."""
+
+    @Signal
+    def device_added(self, device: object) -> None: ...
+
+    @Signal
+    def device_removed(self, device: object) -> None: ...
+
+    def __init__(
+        self,
+        root: str = SYSFS_CLASS,
+        backend: str | None = None,
+        hotplug: bool = True,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self._root = root
+        self._backend = backend
+        self._devices: dict[tuple[str, str], BacklightDevice] = {}
+        self._uevents: UeventMonitor | None = None
+
+        for subsystem in ("backlight", "leds"):
+            try:
+                names = os.listdir(os.path.join(root, subsystem))
+            except FileNotFoundError:
+                continue
+            for name in names:
+                self._add(subsystem, name)
+
+        if hotplug:
+            try:
+                self._uevents = UeventMonitor(("backlight", "leds"), self._on_uevent)
+            except OSError as e:
+                logger.warning(f"{Colors.WARNING}Backlight hotplug disabled: {e}")
+
+    def _on_uevent(self, action: str, subsystem: str, name: str):
+        key = (subsystem, name)
+        if action == "add":
+            self._add(subsystem, name)
+        elif action == "remove":
+            self._remove(key)
+        elif action == "change" and key in self._devices:
+            self._devices[key].refresh()
+
+    def _add(self, subsystem: str, name: str):
+        key = (subsystem, name)
+        if key in self._devices or not is_wanted(subsystem, name):
+            return
+        try:
+            device = BacklightDevice(subsystem, name, self._root, self._backend)
+        except OSError as e:
+            logger.warning(f"{Colors.WARNING}Skipping {subsystem}/{name}: {e}")
+            return
+        self._devices[key] = device
+        logger.info(
+            f"{Colors.INFO}Brightness device added: {subsystem}/{name} "
+            f"(type: {device.kind}, backend: {device.writer_name})"
+        )
+        self.emit("device-added", device)
+
+    def _remove(self, key: tuple[str, str]):
+        device = self._devices.pop(key, None)
+        if device is None:
+            return
+        logger.info(f"{Colors.INFO}Brightness device removed: {'/'.join(key)}")
+        device.close()
+        self.emit("device-removed", device)
+
+    def close(self):
+        for key in list(self._devices):
+            self._remove(key)
+        if self._uevents is not None:
+            self._uevents.close()
+            self._uevents = None
+
+    def get(self, name: str) -> BacklightDevice | None:
+        return next((d for d in self._devices.values() if d.name == name), None)
+
+    @Property(object, "readable")
+    def screens(self) -> list[BacklightDevice]:
+        return sorted(
+            (d for d in self._devices.values() if d.subsystem == "backlight"),
+            key=lambda d: (d.rank, d.name),
+        )
+
+    @Property(object, "readable")
+    def keyboards(self) -> list[BacklightDevice]:
+        return sorted(
+            (d for d in self._devices.values() if d.subsystem == "leds"),
+            key=lambda d: d.name,
+        )
@@ -1,32 +1,11 @@
-import os
-
 from fabric.core.service import Property, Service, Signal
-from fabric.utils import exec_shell_command_async, monitor_file
-from gi.repository import GLib
 from loguru import logger
 
-import utils.functions as helpers
+from services.backlight import SYSFS_CLASS, BacklightDevice, BacklightRegistry
+from services.ddc import DdcBrightness, DdcutilBackend
 from utils.colors import Colors
 
 
-def exec_brightnessctl_async(args: str):
-    if not helpers.executable_exists("brightnessctl"):
-        logger.error(f"{Colors.ERROR}Command brightnessctl not found")
-
-    exec_shell_command_async(f"brightnessctl {args}", lambda _: None)
-
-
-# Discover screen backlight device
-try:
-    screen_device = os.listdir("/sys/class/backlight")
-    screen_device = screen_device[0] if screen_device else ""
-except FileNotFoundError:
-    logger.error(
-        f"{Colors.ERROR}No backlight devices found, brightness control disabled"
-    )
-    screen_device = ""
-
-
 class Brightness(Service):
     """Service to manage screen brightness levels."""
 
@@ -41,71 +20,124 @@ class Brightness(Service):
 
     @Signal
     def screen(self, value: int) -> None:
-        """Signal emitted when screen brightness changes."""
+        """Signal emitted when screen brightness (percent) changes."""
         # Implement as needed for your application
 
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-
-        # Path for screen backlight control
-        self.screen_backlight_path = f"/sys/class/backlight/{screen_device}"
-
-        # Initialize maximum brightness level
-        self.max_screen = self.do_read_max_brightness(self.screen_backlight_path)
+    @Signal
+    def keyboard(self, value: int) -> None:
+        """Signal emitted when keyboard backlight brightness (percent) changes."""
 
-        if screen_device == "":
+    @Signal
+    def monitor(self, display: str, value: int) -> None:
+        """Signal emitted when an external monitor's brightness (percent) changes."""
+
+    def __init__(
+        self,
+        root: str = SYSFS_CLASS,
+        backend: str | None = None,
+        ddc_backend=None,
+        hotplug: bool = True,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self.screen_device: BacklightDevice | None = None
+        self.keyboard_device: BacklightDevice | None = None
+        self._handlers: dict[str, int] = {}
+
+        self.registry = BacklightRegistry(root, backend, hotplug)
+        self.registry.connect("device-added", lambda *_: self._select_devices())
+        self.registry.connect("device-removed", lambda *_: self._select_devices())
+        self._select_devices()
+
+        # External monitors, independent of whether there is a backlight at all
+        self.ddc: DdcBrightness | None = None
+        if ddc_backend is not None or DdcutilBackend.available():
+            self.ddc = DdcBrightness(backend=ddc_backend)
+            self.ddc.connect("changed", lambda _, d, v: self.emit("monitor", d, v))
+            self.ddc.connect("notify::displays", lambda *_: self.notify("displays"))
+
+    def _select_devices(self):
+        # The best ranked backlight drives the screen, the first kbd LED the keyboard
+        screens, keyboards = self.registry.screens, self.registry.keyboards
+        self._attach("screen", screens[0] if screens else None)
+        self._attach("keyboard", keyboards[0] if keyboards else None)
+        self.notify("displays")
+
+    def _attach(self, role: str, device: BacklightDevice | None):
+        current = getattr(self, f"{role}_device")
+        if device is current:
             return
-
-        # Monitor screen brightness file
-        self.screen_monitor = monitor_file(f"{self.screen_backlight_path}/brightness")
-
-        self.screen_monitor.connect(
-            "changed",
-            lambda _, file, *args: self.emit(
-                "screen",
-                round(int(file.load_bytes()[0].get_data())),
-            ),
-        )
-
-        # Log the initialization of the service
-        logger.info(
-            f"{Colors.INFO}Brightness service initialized for device: {screen_device}"
+        if current is not None and role in self._handlers:
+            current.disconnect(self._handlers.pop(role))
+        setattr(self, f"{role}_device", device)
+        if device is None:
+            logger.warning(f"{Colors.WARNING}No {role} brightness device available")
+            return
+        self._handlers[role] = device.connect(
+            "changed", lambda _, percent: self.emit(role, percent)
         )
-
-    def do_read_max_brightness(self, path: str) -> int:
-        # Reads the maximum brightness value from the specified path.
-        max_brightness_path = os.path.join(path, "max_brightness")
-        if os.path.exists(max_brightness_path):
-            with open(max_brightness_path) as f:
-                return int(f.readline())
-        return -1  # Return -1 if file doesn't exist, indicating an error.
+        logger.info(f"{Colors.INFO}Using {device.name} for {role} brightness")
+        self.emit(role, device.percent)
+
+    @property
+    def device(self) -> str:
+        return self.screen_device.name if self.screen_device else ""
+
+    @property
+    def max_screen(self) -> int:
+        return self.screen_device.max_brightness if self.screen_device else -1
+
+    def fade_to(self, value: int, duration_ms: int = 250, curve="ease-out"):
+        """Fade the screen brightness to the raw `value`, cancelling any running fade."""
+        if self.screen_device:
+            self.screen_device.fade_to(value, duration_ms, curve)
+
+    def cancel_fade(self):
+        if self.screen_device:
+            self.screen_device.cancel_fade()
+
+    def step_screen(self, delta: int):
+        if self.screen_device:
+            self.screen_device.step_percent(delta)
+
+    def step_keyboard(self, delta: int):
+        if self.keyboard_device:
+            self.keyboard_device.step_percent(delta)
+
+    def get_display_brightness(self, display: str) -> int:
+        # Percent brightness of a backlight or of a DDC/CI display.
+        device = self.registry.get(display)
+        if device is not None:
+            return device.percent
+        return self.ddc.get_brightness(display) if self.ddc else -1
+
+    def set_display_brightness(self, display: str, percent: int):
+        device = self.registry.get(display)
+        if device is not None:
+            device.set_percent(percent)
+        elif self.ddc:
+            self.ddc.set_brightness(display, percent)
+
+    @Property(object, "readable")
+    def displays(self) -> list[str]:
+        backlights = [d.name for d in self.registry.screens]
+        return backlights + (self.ddc.displays if self.ddc else [])
 
     @Property(int, "read-write")
     def screen_brightness(self) -> int:
-        # Property to get or set the screen brightness.
-        brightness_path = os.path.join(self.screen_backlight_path, "brightness")
-        if os.path.exists(brightness_path):
-            with open(brightness_path) as f:
-                return int(f.readline())
-        logger.warning(
-            f"{Colors.WARNING}Brightness file does not exist: {brightness_path}"
-        )
-        return -1  # Return -1 if file doesn't exist, indicating error.
+        # Property to get or set the raw screen brightness, served from the cache.
+        return self.screen_device.raw if self.screen_device else -1
 
     @screen_brightness.setter
     def screen_brightness(self, value: int):
-        # Setter for screen brightness property.
-        if not (0 <= value <= self.max_screen):
-            value = max(0, min(value, self.max_screen))
-
-        try:
-            exec_brightnessctl_async(f"--device '{screen_device}' set {value}")
-            self.emit("screen", int((value / self.max_screen) * 100))
-            logger.info(
-                f"{Colors.INFO}Set screen brightness to {value} "
-                f"(out of {self.max_screen})"
-            )
-        except GLib.Error as e:
-            logger.error(f"{Colors.ERROR}Error setting screen brightness: {e.message}")
-        except Exception as e:
-            logger.exception(f"Unexpected error setting screen brightness: {e}")
\ No newline at end of file
+        if self.screen_device:
+            self.screen_device.set_raw(value)
+
+    @Property(int, "read-write")
+    def keyboard_brightness(self) -> int:
+        return self.keyboard_device.raw if self.keyboard_device else -1
+
+    @keyboard_brightness.setter
+    def keyboard_brightness(self, value: int):
+        if self.keyboard_device:
+            self.keyboard_device.set_raw(value)
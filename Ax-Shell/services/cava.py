@@ -0,0 +1,262 @@
+"""
+Audio visualizer fed by a single cava process.
+
+cava runs with raw 16-bit binary output, frames are read from its stdout with
+a GLib IO watch and decoded with `array`, and every subscriber gets the bars
+at its own frame rate:
+
+    cava = services.get("cava")
+    handle = cava.subscribe(lambda bars: ..., fps=30)
+    cava.unsubscribe(handle)
+
+cava only runs while something is subscribed, at the highest requested rate.
+`waybar_text(bars)` renders the "▁▂▃▄▅▆▇█" line the waybar module shows; the
+IPC socket publishes it as the "cava" topic.
+"""
+import os
+import subprocess
+import time
+from array import array
+
+from fabric.core.service import Property, Service, Signal
+from gi.repository import GLib
+from loguru import logger
+
+import utils.functions as helpers
+from utils.colors import Colors
+
+BARS = 10
+
+# cava's framerate is the highest one asked for, within these bounds
+DEFAULT_FPS = 30
+MAX_FPS = 60
+
+# 16-bit raw output
+BAR_MAX = 65535
+
+BAR_LEVELS = "▁▂▃▄▅▆▇█"
+
+# Seconds before a cava that exited is started again
+RESTART_DELAY = 1
+
+# Seconds a stopping cava gets after SIGTERM before it is killed
+STOP_TIMEOUT = 1
+
+# Like the IPC socket, never written outside the private runtime dir
+RUNTIME_DIR = os.environ.get("XDG_RUNTIME_DIR")
+CONFIG_PATH = (
+    os.path.join(RUNTIME_DIR, "ax-shell", "cava.conf") if RUNTIME_DIR else None
+)
+
+CONFIG = """\
+[general]
+bars = {bars}
+framerate = {fps}
+
+[input]
+method = pulse
+source = auto
+
+[output]
+method = raw
+raw_target = /dev/stdout
+data_format = binary
+bit_format = 16bit
+"""
+
+
+def waybar_text(bars, levels: str = BAR_LEVELS) -> str:
+    top = len(levels) - 1
+    return "".join(levels[value * top // BAR_MAX] for value in bars)
+
+
+class Subscription:
+    __slots__ = ("callback", "fps", "interval", "last")
+
+    def __init__(self, callback, fps: int):
+        self.callback = callback
+        self.fps = fps
+        self.interval = 1 / fps
+        self.last = 0.0
+
+
+class Cava(Service):
+    """A service sharing one cava process between every visualizer."""
+
+    instance = None
+
+    @staticmethod
+    def get_initial():
+        if Cava.instance is None:
+            Cava.instance = Cava()
+
+        return Cava.instance
+
+    @Signal
+    def stopped(self) -> None: ...
+
+    def __init__(
+        self, bars: int = BARS, config_path: str | None = CONFIG_PATH, **kwargs
+    ):
+        super().__init__(**kwargs)
+        self._bars = bars
+        self._frame_size = 2 * bars
+        self._config_path = config_path
+        self._subscriptions: dict[int, Subscription] = {}
+        self._next_handle = 1
+        self._latest = array("H", bytes(self._frame_size))
+        self._proc: subprocess.Popen | None = None
+        # pid -> stopped processes not reaped yet
+        self._exiting: dict[int, subprocess.Popen] = {}
+        self._fps = 0
+        self._buffer = bytearray()
+        self._watch_id: int | None = None
+        self._restart_id: int | None = None
+
+    def subscribe(self, callback, fps: int = DEFAULT_FPS) -> int:
+        """Call `callback(bars)` at up to `fps` frames per second."""
+        handle = self._next_handle
+        self._next_handle += 1
+        fps = max(1, min(fps, MAX_FPS))
+        self._subscriptions[handle] = Subscription(callback, fps)
+        self._update_process()
+        return handle
+
+    def unsubscribe(self, handle: int):
+        if self._subscriptions.pop(handle, None) is not None:
+            self._update_process()
+
+    def _update_process(self):
+        fps = max((s.fps for s in self._subscriptions.values()), default=0)
+        if fps == self._fps and (self._proc or self._restart_id):
+            return
+        self._stop()
+        self._fps = fps
+        if fps:
+            self._start()
+
+    def _start(self):
+        self._restart_id = None
+        if not helpers.executable_exists("cava"):
+            logger.warning(f"{Colors.WARNING}[Cava] cava is not installed")
+            return False
+        if not self._config_path:
+            logger.warning(f"{Colors.WARNING}[Cava] XDG_RUNTIME_DIR is not set")
+            return False
+        try:
+            self._write_config()
+            self._proc = subprocess.Popen(
+                ["cava", "-p", self._config_path],
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+        except OSError as e:
+            logger.warning(f"{Colors.WARNING}[Cava] Can't start cava: {e}")
+            return False
+        fd = self._proc.stdout.fileno()
+        os.set_blocking(fd, False)
+        self._buffer.clear()
+        self._watch_id = GLib.io_add_watch(
+            fd, GLib.PRIORITY_DEFAULT, GLib.IO_IN | GLib.IO_HUP, self._on_output
+        )
+        return False
+
+    def _write_config(self):
+        directory = os.path.dirname(self._config_path)
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        if os.stat(directory).st_uid != os.getuid():
+            raise PermissionError(f"{directory} belongs to another user")
+        os.chmod(directory, 0o700)
+        # Replacing the file never follows a link planted at its path
+        partial = f"{self._config_path}.tmp"
+        flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_NOFOLLOW
+        fd = os.open(partial, flags, 0o600)
+        with open(fd, "w") as f:
+            f.write(CONFIG.format(bars=self._bars, fps=self._fps))
+        os.replace(partial, self._config_path)
+
+    def _stop(self):
+        for source_id in (self._watch_id, self._restart_id):
+            if source_id is not None:
+                GLib.source_remove(source_id)
+        self._watch_id = self._restart_id = None
+        if self._proc is not None:
+            self._proc.terminate()
+            self._release(self._proc)
+            self._proc = None
+
+    def _release(self, proc: subprocess.Popen):
+        # Reaped by a child watch, the main loop never waits on cava
+        proc.stdout.close()
+        self._exiting[proc.pid] = proc
+
+        def kill() -> bool:
+            if proc.pid in self._exiting:
+                proc.kill()
+            return False
+
+        kill_id = GLib.timeout_add_seconds(STOP_TIMEOUT, kill)
+        GLib.child_watch_add(
+            GLib.PRIORITY_DEFAULT, proc.pid, self._on_reaped, kill_id
+        )
+
+    def _on_reaped(self, pid: int, status: int, kill_id: int):
+        GLib.source_remove(kill_id)
+        proc = self._exiting.pop(pid, None)
+        if proc is not None:
+            proc.returncode = os.waitstatus_to_exitcode(status)
+
+    def _on_output(self, fd, condition) -> bool:
+        try:
+            data = os.read(fd, 64 * self._frame_size)
+        except BlockingIOError:
+            return True
+        if not data:
+            return self._on_exit()
+        buffer = self._buffer
+        buffer += data
+        frames = len(buffer) // self._frame_size
+        if not frames:
+            return True
+        # Only the newest complete frame matters when several piled up
+        end = frames * self._frame_size
+        # cava writes native-endian uint16, the same layout as array("H")
+        bars = array("H")
+        with memoryview(buffer) as view:
+            bars.frombytes(view[end - self._frame_size : end])
+        del buffer[:end]
+        self._latest = bars
+        self._dispatch(bars)
+        return True
+
+    def _dispatch(self, bars: array):
+        now = time.monotonic()
+        for subscription in list(self._subscriptions.values()):
+            # Some slack so a subscriber at cava's own rate gets every frame
+            if now - subscription.last >= subscription.interval * 0.8:
+                subscription.last = now
+                try:
+                    subscription.callback(bars)
+                except Exception as e:
+                    # One broken visualizer must not stop the others
+                    logger.warning(f"{Colors.WARNING}[Cava] Subscriber failed: {e}")
+
+    def _on_exit(self) -> bool:
+        self._watch_id = None
+        self._release(self._proc)
+        self._proc = None
+        logger.warning(f"{Colors.WARNING}[Cava] cava closed its output")
+        self.emit("stopped")
+        if self._subscriptions:
+            self._restart_id = GLib.timeout_add_seconds(RESTART_DELAY, self._start)
+        return False
+
+    def close(self):
+        self._subscriptions.clear()
+        self._stop()
+        self._fps = 0
+
+    @Property(object, "readable")
+    def bars(self) -> array:
+        return self._latest
@@ -0,0 +1,197 @@
+import re
+import subprocess
+import threading
+
+from fabric.core.service import Property, Service, Signal
+from gi.repository import GLib
+from loguru import logger
+
+import utils.functions as helpers
+from utils.colors import Colors
+
+# VCP feature code for luminance
+VCP_BRIGHTNESS = "10"
+
+# Seconds between two reads of every display, changes made with the monitor's
+# own buttons are picked up on the next refresh.
+REFRESH_INTERVAL = 30.0
+
+
+class DdcutilBackend:
+    """Talks DDC/CI through the ddcutil CLI. Every call blocks for 50-200 ms."""
+
+    name = "ddcutil"
+
+    @staticmethod
+    def available() -> bool:
+        return helpers.executable_exists("ddcutil")
+
+    def _run(self, *args: str) -> str:
+        return subprocess.run(
+            ["ddcutil", "--brief", *args],
+            capture_output=True,
+            text=True,
+            check=True,
+            timeout=5,
+        ).stdout
+
+    def detect(self) -> list[str]:
+        return re.findall(r"^Display (\d+)", self._run("detect"), re.MULTILINE)
+
+    def read(self, display: str) -> tuple[int, int]:
+        # Output looks like "VCP 10 C 50 100"
+        fields = self._run("--display", display, "getvcp", VCP_BRIGHTNESS).split()
+        return int(fields[3]), int(fields[4])
+
+    def write(self, display: str, value: int):
+        self._run("--display", display, "setvcp", VCP_BRIGHTNESS, str(value))
+
+
+class DdcWorker:
+    """Runs all DDC/CI traffic on a thread, merging queued writes per display."""
+
+    def __init__(
+        self, backend, on_detect, on_update, on_written, interval=REFRESH_INTERVAL
+    ):
+        self._backend = backend
+        self._on_detect = on_detect
+        self._on_update = on_update
+        self._on_written = on_written
+        self._interval = interval
+        self._cond = threading.Condition()
+        self._pending: dict[str, int] = {}
+        self._refresh = True
+        self._running = False
+        self._thread: threading.Thread | None = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="ddc", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+
+    def write(self, display: str, value: int):
+        with self._cond:
+            # A newer value replaces one still waiting for the bus
+            self._pending[display] = value
+            self._cond.notify()
+
+    def refresh(self):
+        with self._cond:
+            self._refresh = True
+            self._cond.notify()
+
+    def _run(self):
+        try:
+            displays = self._backend.detect()
+        except Exception as e:
+            logger.warning(f"{Colors.WARNING}[DDC] Detection failed: {e}")
+            return
+        GLib.idle_add(lambda: (self._on_detect(displays), False)[1])
+
+        while True:
+            with self._cond:
+                if not (self._pending or self._refresh):
+                    self._cond.wait(self._interval)
+                if not self._running:
+                    return
+                pending, self._pending = self._pending, {}
+                refresh = self._refresh or not pending
+                self._refresh = False
+
+            for display, value in pending.items():
+                self._call(self._backend.write, display, value)
+                GLib.idle_add(
+                    lambda d=display, v=value: (self._on_written(d, v), False)[1]
+                )
+
+            # Written displays are read back, the monitor may clamp the value
+            for display in displays if refresh else list(pending):
+                result = self._call(self._backend.read, display)
+                if result is not None:
+                    GLib.idle_add(
+                        lambda d=display, r=result: (self._on_update(d, *r), False)[1]
+                    )
+
+    def _call(self, func, *args):
+        try:
+            return func(*args)
+        except Exception as e:
+            logger.warning(f"{Colors.WARNING}[DDC] {func.__name__}{args} failed: {e}")
+            return None
+
+
+class DdcBrightness(Service):
+    """A service exposing cached brightness of external monitors over DDC/CI."""
+
+    @Signal
+    def display_added(self, display: str) -> None: ...
+
+    @Signal
+    def changed(self, display: str, value: int) -> None: ...
+
+    def __init__(self, backend=None, interval: float = REFRESH_INTERVAL, **kwargs):
+        super().__init__(**kwargs)
+        self._values: dict[str, int] = {}
+        self._max: dict[str, int] = {}
+        # display -> raw value set but not yet on the bus
+        self._writing: dict[str, int] = {}
+        self._worker = DdcWorker(
+            backend or DdcutilBackend(),
+            self._on_detect,
+            self._on_update,
+            self._on_written,
+            interval,
+        )
+        self._worker.start()
+
+    def _on_detect(self, displays: list[str]):
+        logger.info(f"[DDC] Found {len(displays)} display(s)")
+        self.notify("displays")
+
+    def _on_written(self, display: str, value: int):
+        if self._writing.get(display) == value:
+            del self._writing[display]
+
+    def _on_update(self, display: str, value: int, maximum: int):
+        # Readings only land on the main loop, the cache is never touched by the worker
+        if display in self._writing:
+            # Taken before the last write reached the monitor, a read-back follows
+            return
+        is_new = display not in self._values
+        self._max[display] = maximum or 100
+        percent = round(value * 100 / self._max[display])
+        if not is_new and self._values[display] == percent:
+            return
+        self._values[display] = percent
+        if is_new:
+            self.emit("display-added", display)
+            self.notify("displays")
+        self.emit("changed", display, percent)
+
+    def get_brightness(self, display: str) -> int:
+        return self._values.get(display, -1)
+
+    def set_brightness(self, display: str, percent: int):
+        if display not in self._values:
+            return
+        percent = max(0, min(percent, 100))
+        if self._values[display] != percent:
+            self._values[display] = percent
+            self.emit("changed", display, percent)
+        value = self._writing[display] = round(percent * self._max[display] / 100)
+        self._worker.write(display, value)
+
+    def refresh(self):
+        self._worker.refresh()
+
+    def stop(self):
+        self._worker.stop()
+
+    @Property(object, "readable")
+    def displays(self) -> list[str]:
+        return list(self._values)
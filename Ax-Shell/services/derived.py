@@ -0,0 +1,61 @@
+"""
+Cached derived values for fabric Property getters.
+
+    @Property(str, "readable")
+    @derived("internet", "bucket")
+    def icon_name(self): ...
+
+The getter runs once and its result is served from a per-instance cache until
+one of its sources is passed to `invalidate(self, ...)`. Sources are names,
+by convention the GI signal or notify that changes the underlying state
+("state-changed", "notify::strength"). Naming another derived getter as a
+source makes the dependency transitive.
+"""
+import functools
+
+# "module.Class" -> source -> derived getters depending on it
+_dependents: dict[str, dict[str, set[str]]] = {}
+
+
+def derived(*sources: str):
+    def decorator(getter):
+        name = getter.__name__
+        owner = f"{getter.__module__}.{getter.__qualname__.rsplit('.', 1)[0]}"
+        graph = _dependents.setdefault(owner, {})
+        for source in sources:
+            graph.setdefault(source, set()).add(name)
+
+        @functools.wraps(getter)
+        def wrapper(self):
+            cache = vars(self).setdefault("_derived", {})
+            try:
+                return cache[name]
+            except KeyError:
+                value = cache[name] = getter(self)
+                return value
+
+        return wrapper
+
+    return decorator
+
+
+def invalidate(obj, *sources: str):
+    """Drop the cached values depending on `sources`, transitively."""
+    cache = vars(obj).get("_derived")
+    if not cache:
+        return
+    graphs = [
+        graph
+        for klass in type(obj).__mro__
+        if (graph := _dependents.get(f"{klass.__module__}.{klass.__qualname__}"))
+    ]
+    pending, seen = list(sources), set()
+    while pending:
+        source = pending.pop()
+        if source in seen:
+            continue
+        seen.add(source)
+        for graph in graphs:
+            for name in graph.get(source, ()):
+                cache.pop(name, None)
+                pending.append(name)
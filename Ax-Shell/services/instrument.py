@@ -0,0 +1,180 @@
+"""
+Optional main-loop instrumentation for the services.
+
+Enabled by setting AX_SHELL_TRACE=1 before the services package is imported.
+It wraps Service.emit/notify and GLib.idle_add/timeout_add to record counts
+and latency histograms per service and signal, property or callback, logs a
+summary every AX_SHELL_TRACE_INTERVAL seconds (default 60) and dumps JSON to
+$XDG_RUNTIME_DIR/ax-shell-trace.json on SIGUSR1. Without XDG_RUNTIME_DIR
+there is no dump, only the logged summaries.
+
+When the variable is not set this module is never imported.
+"""
+import bisect
+import json
+import os
+import signal
+import time
+
+from fabric.core.service import Service
+from gi.repository import GLib
+from loguru import logger
+
+# Upper bounds of the latency buckets, in µs
+BUCKETS = (50, 100, 250, 500, 1_000, 2_500, 5_000, 10_000, 25_000, 50_000, 100_000)
+
+# Like the IPC socket, never written outside the private runtime dir
+RUNTIME_DIR = os.environ.get("XDG_RUNTIME_DIR")
+DUMP_PATH = os.path.join(RUNTIME_DIR, "ax-shell-trace.json") if RUNTIME_DIR else None
+
+
+class Stat:
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def add(self, us: float):
+        self.count += 1
+        self.total += us
+        self.max = max(self.max, us)
+        self.buckets[bisect.bisect_left(BUCKETS, us)] += 1
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_us": self.total / self.count if self.count else 0,
+            "max_us": self.max,
+            "histogram": dict(
+                zip([f"<={b}us" for b in BUCKETS] + ["inf"], self.buckets)
+            ),
+        }
+
+
+# (service, kind, name) -> Stat
+_stats: dict[tuple[str, str, str], Stat] = {}
+_installed = False
+
+
+def record(service: str, kind: str, name: str, us: float):
+    key = (service, kind, name)
+    stat = _stats.get(key)
+    if stat is None:
+        stat = _stats[key] = Stat()
+    stat.add(us)
+
+
+def snapshot() -> list[dict]:
+    return [
+        {"service": service, "kind": kind, "name": name, **stat.as_dict()}
+        for (service, kind, name), stat in sorted(_stats.items())
+    ]
+
+
+def dump(path: str | None = DUMP_PATH) -> str | None:
+    if not path:
+        return None
+    # A fresh file renamed into place never follows a link planted at `path`
+    partial = f"{path}.{os.getpid()}.tmp"
+    fd = os.open(partial, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    try:
+        with open(fd, "w") as f:
+            json.dump(snapshot(), f, indent=2)
+        os.replace(partial, path)
+    except BaseException:
+        os.unlink(partial)
+        raise
+    return path
+
+
+def _callback_label(func) -> tuple[str, str]:
+    owner = getattr(func, "__self__", None)
+    if owner is not None:
+        return type(owner).__name__, func.__name__
+    qualname = getattr(func, "__qualname__", repr(func))
+    return qualname.split(".", 1)[0], qualname
+
+
+def _wrap_source(kind: str, add):
+    def wrapped(*args, **kwargs):
+        # idle_add(func, ...) or timeout_add(interval, func, ...)
+        index = 0 if kind == "idle" else 1
+        func = args[index]
+        service, name = _callback_label(func)
+        queued = time.perf_counter()
+
+        def run(*cb_args):
+            nonlocal queued
+            try:
+                return func(*cb_args)
+            finally:
+                now = time.perf_counter()
+                record(service, kind, name, (now - queued) * 1e6)
+                queued = now
+
+        return add(*args[:index], run, *args[index + 1 :], **kwargs)
+
+    return wrapped
+
+
+def _wrap_method(kind: str, method):
+    def wrapped(self, name, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(self, name, *args, **kwargs)
+        finally:
+            record(
+                type(self).__name__,
+                kind,
+                str(name),
+                (time.perf_counter() - start) * 1e6,
+            )
+
+    return wrapped
+
+
+def log_summary(top: int = 10):
+    stats = sorted(_stats.items(), key=lambda item: item[1].total, reverse=True)
+    logger.info(f"[Trace] {sum(s.count for _, s in stats)} events, top by total time:")
+    for (service, kind, name), stat in stats[:top]:
+        logger.info(
+            f"[Trace]   {service} {kind} {name}: {stat.count}x, "
+            f"mean {stat.total / stat.count:.0f}us, max {stat.max:.0f}us"
+        )
+
+
+def _on_sigusr1():
+    try:
+        path = dump()
+    except OSError as e:
+        logger.warning(f"[Trace] Dump failed: {e}")
+        return True
+    if path is None:
+        logger.warning("[Trace] XDG_RUNTIME_DIR is not set, not dumping")
+    else:
+        logger.info(f"[Trace] Dumped to {path}")
+    return True
+
+
+def install(interval: int | None = None):
+    global _installed
+    if _installed:
+        return
+    _installed = True
+
+    Service.emit = _wrap_method("signal", Service.emit)
+    Service.notify = _wrap_method("notify", Service.notify)
+    GLib.idle_add = _wrap_source("idle", GLib.idle_add)
+    GLib.timeout_add = _wrap_source("timeout", GLib.timeout_add)
+
+    interval = interval or int(os.environ.get("AX_SHELL_TRACE_INTERVAL", 60))
+    GLib.timeout_add_seconds(interval, lambda: (log_summary(), True)[1])
+    GLib.unix_signal_add(GLib.PRIORITY_DEFAULT, signal.SIGUSR1, _on_sigusr1)
+    logger.info(
+        f"[Trace] Main-loop instrumentation on, SIGUSR1 dumps to {DUMP_PATH}"
+        if DUMP_PATH
+        else "[Trace] Main-loop instrumentation on, no dump without XDG_RUNTIME_DIR"
+    )
@@ -0,0 +1,455 @@
+"""
+State streaming over a Unix socket.
+
+One process hosts the Brightness, MPRIS and network services and publishes
+their state to any number of front ends (waybar, quickshell, ags, ...):
+
+    python -m services.ipc
+
+Clients connect to $XDG_RUNTIME_DIR/ax-shell/state.sock and send text
+lines; everything sent back is newline-delimited JSON.
+
+    subscribe brightness media      -> {"topic": ..., "snapshot": {...}} per topic,
+                                       then {"topic": ..., "diff": {...}} on change
+    subscribe *                     -> every topic
+    subscribe cava                  -> visualizer bars, cava runs only while
+                                       someone is subscribed
+
+The same socket takes commands, answered only when they fail:
+
+    brightness.step -5              brightness.set 40
+    keyboard.step 10                mpris.play_pause
+    mpris.next                      mpris.previous
+    wifi.toggle                     wifi.scan
+    wallpaper.apply <path>
+
+so a keybind needs no interpreter, brightnessctl or playerctl start-up:
+
+    bind = , XF86MonBrightnessUp, exec, echo 'brightness.step 5' | \
+        socat -u - UNIX-CONNECT:$XDG_RUNTIME_DIR/ax-shell/state.sock
+"""
+import json
+import os
+import socket
+
+from gi.repository import GLib
+from loguru import logger
+
+import services
+
+# The socket takes commands, so it only ever lives in the private runtime dir
+RUNTIME_DIR = os.environ.get("XDG_RUNTIME_DIR")
+SOCKET_PATH = (
+    os.path.join(RUNTIME_DIR, "ax-shell", "state.sock") if RUNTIME_DIR else None
+)
+
+# A client that lets this much output pile up is dropped
+MAX_BUFFERED = 1024 * 1024
+
+
+class Client:
+    __slots__ = ("sock", "topics", "inbuf", "outbuf", "read_id", "write_id")
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.topics: set[str] = set()
+        self.inbuf = b""
+        self.outbuf = b""
+        self.read_id: int | None = None
+        self.write_id: int | None = None
+
+
+class Topic:
+    """A named piece of state, collected from services when they signal."""
+
+    def __init__(self, name: str, collect):
+        self.name = name
+        self.collect = collect
+        self.state: dict | None = None
+        # (object, handler id) pairs, re-made when the tracked objects change
+        self.handlers: list[tuple[object, int]] = []
+        # Optional hooks run when the first client subscribes and the last leaves
+        self.on_first = None
+        self.on_last = None
+
+    def watch(self, obj, signals: tuple[str, ...], callback):
+        for signal in signals:
+            self.handlers.append((obj, obj.connect(signal, lambda *_: callback())))
+
+    def unwatch(self):
+        for obj, handler_id in self.handlers:
+            obj.disconnect(handler_id)
+        self.handlers.clear()
+
+
+class IpcServer:
+    """Serves topic snapshots and diffs to socket clients."""
+
+    def __init__(self, path: str | None = SOCKET_PATH):
+        self._path = path
+        self._topics: dict[str, Topic] = {}
+        self._commands: dict[str, object] = {}
+        self._clients: dict[int, Client] = {}
+        self._dirty: set[str] = set()
+        self._flush_id: int | None = None
+        self._sock: socket.socket | None = None
+
+    def add_topic(self, name: str, collect) -> Topic:
+        topic = self._topics[name] = Topic(name, collect)
+        topic.state = collect()
+        return topic
+
+    def add_command(self, name: str, func):
+        """Register `func(*args)`, called with the words after the command."""
+        self._commands[name] = func
+
+    def mark_dirty(self, name: str):
+        # Bursts of signals are folded into one diff per main-loop cycle
+        self._dirty.add(name)
+        if self._flush_id is None:
+            self._flush_id = GLib.idle_add(self._flush)
+
+    def start(self):
+        if not self._path:
+            raise RuntimeError("XDG_RUNTIME_DIR is not set, not opening the socket")
+        directory = os.path.dirname(self._path)
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        if os.stat(directory).st_uid != os.getuid():
+            raise RuntimeError(f"{directory} belongs to another user")
+        os.chmod(directory, 0o700)
+        if os.path.exists(self._path):
+            os.unlink(self._path)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.setblocking(False)
+        self._sock.bind(self._path)
+        os.chmod(self._path, 0o600)
+        self._sock.listen(16)
+        GLib.io_add_watch(
+            self._sock.fileno(), GLib.PRIORITY_DEFAULT, GLib.IO_IN, self._on_accept
+        )
+        logger.info(f"[IPC] Listening on {self._path}")
+
+    def _on_accept(self, *_) -> bool:
+        try:
+            sock, _ = self._sock.accept()
+        except BlockingIOError:
+            return True
+        sock.setblocking(False)
+        client = Client(sock)
+        self._clients[sock.fileno()] = client
+        client.read_id = GLib.io_add_watch(
+            sock.fileno(),
+            GLib.PRIORITY_DEFAULT,
+            GLib.IO_IN | GLib.IO_HUP | GLib.IO_ERR,
+            self._on_readable,
+            client,
+        )
+        return True
+
+    def _on_readable(self, fd, condition, client: Client) -> bool:
+        try:
+            data = client.sock.recv(4096)
+        except BlockingIOError:
+            return True
+        except OSError:
+            data = b""
+        if not data:
+            client.read_id = None
+            self._drop(client)
+            return False
+        client.inbuf += data
+        while b"\n" in client.inbuf and client.read_id is not None:
+            line, client.inbuf = client.inbuf.split(b"\n", 1)
+            self.handle_line(client, line.decode(errors="replace").strip())
+        return client.read_id is not None
+
+    def handle_line(self, client: Client, line: str):
+        command, _, rest = line.partition(" ")
+        if command == "subscribe":
+            names = rest.split() or ["*"]
+            if "*" in names:
+                names = list(self._topics)
+            for name in names:
+                if name not in self._topics or name in client.topics:
+                    continue
+                topic = self._topics[name]
+                if topic.on_first and not self._subscribed(name):
+                    topic.on_first()
+                client.topics.add(name)
+                self._send(client, {"topic": name, "snapshot": topic.state})
+        elif command in self._commands:
+            try:
+                self._commands[command](*rest.split())
+            except Exception as e:
+                # Anything escaping here would drop the read watch, not the client
+                logger.warning(f"[IPC] {command} failed: {e}")
+                self._send(client, {"error": f"{command}: {e}"})
+        elif command:
+            self._send(client, {"error": f"unknown command: {command}"})
+
+    def _subscribed(self, name: str) -> bool:
+        return any(name in client.topics for client in self._clients.values())
+
+    def _flush(self) -> bool:
+        self._flush_id = None
+        dirty, self._dirty = self._dirty, set()
+        for name in dirty:
+            topic = self._topics[name]
+            state = topic.collect()
+            old = topic.state or {}
+            diff = {k: v for k, v in state.items() if old.get(k) != v}
+            topic.state = state
+            if not diff:
+                continue
+            line = json.dumps({"topic": name, "diff": diff}).encode() + b"\n"
+            for client in list(self._clients.values()):
+                if name in client.topics:
+                    self._write(client, line)
+        return False
+
+    def _send(self, client: Client, message: dict):
+        self._write(client, json.dumps(message).encode() + b"\n")
+
+    def _write(self, client: Client, data: bytes):
+        client.outbuf += data
+        if client.write_id is None:
+            self._on_writable(None, None, client)
+
+    def _on_writable(self, fd, condition, client: Client) -> bool:
+        try:
+            sent = client.sock.send(client.outbuf)
+            client.outbuf = client.outbuf[sent:]
+        except BlockingIOError:
+            pass
+        except OSError:
+            self._drop_from_writer(client, fd)
+            return False
+        if len(client.outbuf) > MAX_BUFFERED:
+            logger.warning("[IPC] Dropping a client that stopped reading")
+            self._drop_from_writer(client, fd)
+            return False
+        if client.outbuf and client.write_id is None:
+            client.write_id = GLib.io_add_watch(
+                client.sock.fileno(),
+                GLib.PRIORITY_DEFAULT,
+                GLib.IO_OUT,
+                self._on_writable,
+                client,
+            )
+        if not client.outbuf and client.write_id is not None:
+            client.write_id = None
+            return False
+        return True
+
+    def _drop_from_writer(self, client: Client, fd):
+        # fd is None when called directly rather than from the IO_OUT watch
+        if fd is not None:
+            client.write_id = None
+        self._drop(client)
+
+    def _drop(self, client: Client):
+        for source_id in (client.read_id, client.write_id):
+            if source_id is not None:
+                GLib.source_remove(source_id)
+        client.read_id = client.write_id = None
+        self._clients.pop(client.sock.fileno(), None)
+        client.sock.close()
+        for name in client.topics:
+            topic = self._topics[name]
+            if topic.on_last and not self._subscribed(name):
+                topic.on_last()
+        client.topics.clear()
+
+
+def brightness_commands(server: IpcServer, brightness):
+    def set_screen(percent: str):
+        if brightness.screen_device:
+            brightness.screen_device.set_percent(int(percent))
+
+    server.add_command("brightness.step", lambda d: brightness.step_screen(int(d)))
+    server.add_command("brightness.set", set_screen)
+    server.add_command("keyboard.step", lambda d: brightness.step_keyboard(int(d)))
+
+
+def media_commands(server: IpcServer, manager):
+    def on_active(action: str):
+        def run():
+            player = manager.active_player
+            if player is not None:
+                getattr(player, action)()
+
+        return run
+
+    for action in ("play_pause", "next", "previous"):
+        server.add_command(f"mpris.{action}", on_active(action))
+
+
+def network_commands(server: IpcServer, client):
+    def toggle():
+        if client.wifi_device is not None:
+            client.wifi_device.toggle_wifi()
+
+    def scan():
+        # Asked for explicitly, so the radio scans even with fresh results
+        if client.wifi_device is not None:
+            client.wifi_device.scan(force=True)
+
+    server.add_command("wifi.toggle", toggle)
+    server.add_command("wifi.scan", scan)
+
+
+def wallpaper_commands(server: IpcServer, catalog):
+    # Paths may contain spaces, so the whole rest of the line is the path
+    server.add_command("wallpaper.apply", lambda *words: catalog.apply(" ".join(words)))
+
+
+def brightness_topic(server: IpcServer, brightness):
+    def collect() -> dict:
+        screen, keyboard = brightness.screen_device, brightness.keyboard_device
+        return {
+            "screen": screen.percent if screen else None,
+            "keyboard": keyboard.percent if keyboard else None,
+            "monitors": {
+                d: brightness.ddc.get_brightness(d)
+                for d in (brightness.ddc.displays if brightness.ddc else [])
+            },
+        }
+
+    topic = server.add_topic("brightness", collect)
+    topic.watch(
+        brightness,
+        ("screen", "keyboard", "monitor", "notify::displays"),
+        lambda: server.mark_dirty("brightness"),
+    )
+
+
+def media_topic(server: IpcServer, manager):
+    def collect() -> dict:
+        player = manager.active_player
+        if player is None:
+            return {"player": None}
+        return {
+            "player": player.player_name,
+            "status": player.playback_status,
+            "title": player.title,
+            "artist": player.artist,
+            "album": player.album,
+            "arturl": player.arturl,
+            "length": player.length,
+            "position": player.position,
+        }
+
+    topic = server.add_topic("media", collect)
+
+    def follow_active():
+        # Re-attach to whichever player is active now
+        topic.unwatch()
+        topic.watch(manager, ("notify::active-player",), follow_active)
+        if manager.active_player is not None:
+            topic.watch(
+                manager.active_player,
+                ("changed",),
+                lambda: server.mark_dirty("media"),
+            )
+        server.mark_dirty("media")
+
+    follow_active()
+
+
+def network_topic(server: IpcServer, client):
+    def describe(service) -> dict | None:
+        if service is None:
+            return None
+        state = {"icon": service.icon_name, "internet": service.internet}
+        if hasattr(service, "ssid"):
+            state.update(
+                ssid=service.ssid, strength=service.strength, enabled=service.enabled
+            )
+        else:
+            state.update(speed=service.speed)
+        return state
+
+    def collect() -> dict:
+        return {
+            "primary": client.primary_device,
+            "wifi": describe(client.wifi_device),
+            "ethernet": describe(client.ethernet_device),
+        }
+
+    topic = server.add_topic("network", collect)
+
+    def follow_devices():
+        topic.unwatch()
+        topic.watch(
+            client,
+            (
+                "notify::primary-device",
+                "notify::wifi-device",
+                "notify::ethernet-device",
+                "device-added",
+                "device-removed",
+            ),
+            follow_devices,
+        )
+        for service in (client.wifi_device, client.ethernet_device):
+            if service is not None:
+                topic.watch(
+                    service, ("changed",), lambda: server.mark_dirty("network")
+                )
+        server.mark_dirty("network")
+
+    follow_devices()
+
+
+def cava_topic(server: IpcServer, cava, fps: int = 30):
+    from services.cava import BAR_MAX, waybar_text
+
+    def collect() -> dict:
+        bars = cava.bars
+        return {
+            "text": waybar_text(bars),
+            "bars": [value * 100 // BAR_MAX for value in bars],
+        }
+
+    topic = server.add_topic("cava", collect)
+    handle = None
+
+    def start():
+        nonlocal handle
+        handle = cava.subscribe(lambda _: server.mark_dirty("cava"), fps)
+
+    def stop():
+        cava.unsubscribe(handle)
+
+    topic.on_first, topic.on_last = start, stop
+
+
+def serve(path: str | None = SOCKET_PATH) -> IpcServer:
+    """Host the services in this process and publish them on `path`."""
+    server = IpcServer(path)
+    for name, topic, commands in (
+        ("brightness", brightness_topic, brightness_commands),
+        ("mpris", media_topic, media_commands),
+        ("network", network_topic, network_commands),
+    ):
+        service = services.get(name)
+        if service is not None:
+            topic(server, service)
+            commands(server, service)
+    cava = services.get("cava")
+    if cava is not None:
+        cava_topic(server, cava)
+    catalog = services.get("wallpapers")
+    if catalog is not None:
+        wallpaper_commands(server, catalog)
+    server.start()
+    return server
+
+
+if __name__ == "__main__":
+    try:
+        serve()
+    except RuntimeError as e:
+        logger.error(f"[IPC] {e}")
+        raise SystemExit(1)
+    GLib.MainLoop().run()
@@ -1,15 +1,18 @@
 # Standard library imports
 import contextlib
+import time
 
 # Third-party imports
 import gi
-from gi.repository import GLib  # type: ignore
+from gi.repository import Gio, GLib  # type: ignore
 from loguru import logger
 
 # Fabric imports
 from fabric.core.service import Property, Service, Signal
 from fabric.utils import bulk_connect
 
+from services.derived import derived, invalidate
+
 class PlayerctlImportError(ImportError):
     """An error to raise when playerctl is not installed."""
     def __init__(self, *args):
@@ -25,6 +28,83 @@ try:
 except ValueError:
     raise PlayerctlImportError
 
+# Position drift (µs) tolerated between the local clock and the player
+MAX_POSITION_DRIFT = 500_000
+
+# Resync bounds (s) while playing; the interval doubles while the clock is on time
+POSITION_RESYNC_MIN = 5
+POSITION_RESYNC_MAX = 60
+
+MPRIS_PATH = "/org/mpris/MediaPlayer2"
+MPRIS_PLAYER_INTERFACE = "org.mpris.MediaPlayer2.Player"
+
+PLAYBACK_STATUSES = {
+    Playerctl.PlaybackStatus.PAUSED: "paused",
+    Playerctl.PlaybackStatus.PLAYING: "playing",
+    Playerctl.PlaybackStatus.STOPPED: "stopped",
+}
+
+LOOP_STATUSES = {
+    Playerctl.LoopStatus.NONE: "none",
+    Playerctl.LoopStatus.TRACK: "track",
+    Playerctl.LoopStatus.PLAYLIST: "playlist",
+}
+LOOP_STATUS_VALUES = {name: value for value, name in LOOP_STATUSES.items()}
+
+# bus name -> probed capabilities, dropped when the name appears again
+_capabilities: dict[str, dict[str, bool]] = {}
+
+
+def invalidate_capabilities(instance: str):
+    _capabilities.pop(f"org.mpris.MediaPlayer2.{instance}", None)
+
+
+class TrackMetadata:
+    """Immutable snapshot of a player's metadata, rebuilt once per change."""
+
+    __slots__ = ("raw", "trackid", "title", "artist", "album", "arturl", "length")
+
+    def __init__(self, metadata=None):
+        # metadata arrives as an a{sv} GLib.Variant, unpack it only once
+        raw = metadata.unpack() if isinstance(metadata, GLib.Variant) else metadata
+        raw = dict(raw or {})
+        artist = raw.get("xesam:artist") or ""
+        if isinstance(artist, (list, tuple)):
+            artist = ", ".join(artist)
+        title = raw.get("xesam:title")
+        for name, value in (
+            ("raw", raw),
+            ("trackid", raw.get("mpris:trackid")),
+            ("title", title if isinstance(title, str) else ""),
+            ("artist", artist),
+            ("album", raw.get("xesam:album") or ""),
+            ("arturl", raw.get("mpris:artUrl")),
+            ("length", raw.get("mpris:length")),
+        ):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("TrackMetadata is immutable")
+
+
+class PositionClock:
+    """Extrapolates the playback position (µs) from the last known anchor."""
+
+    __slots__ = ("_position", "_anchored_at", "_playing")
+
+    def __init__(self, position: int = 0, playing: bool = False):
+        self.anchor(position, playing)
+
+    def anchor(self, position: int, playing: bool):
+        self._position = position
+        self._anchored_at = time.monotonic()
+        self._playing = playing
+
+    def predict(self) -> int:
+        if not self._playing:
+            return self._position
+        return self._position + int((time.monotonic() - self._anchored_at) * 1e6)
+
 
 class MprisPlayer(Service):
     """A service to manage a mpris player."""
@@ -33,70 +113,192 @@ class MprisPlayer(Service):
     def exit(self, value: bool) -> bool: ...
 
     @Signal
-    def changed(self) -> None: ...
+    def changed(self, properties: object) -> None: ...
 
     def __init__(
         self,
         player: Playerctl.Player,
+        max_drift: int = MAX_POSITION_DRIFT,
         **kwargs,
     ):
         self._signal_connectors: dict = {}
         self._player: Playerctl.Player = player
+        self._dirty: set[str] = set()
+        self._meta = TrackMetadata(player.get_property("metadata"))
+        self._flush_id: int | None = None
+        self._max_drift = max_drift
+        self._clock = PositionClock()
+        self._resync_id: int | None = None
+        self._resync_interval = POSITION_RESYNC_MIN
         super().__init__(**kwargs)
-        for sn in ["playback-status", "loop-status", "shuffle", "volume", "seeked"]:
+        for sn in ["loop-status", "shuffle", "volume"]:
             self._signal_connectors[sn] = self._player.connect(
                 sn,
-                lambda *args, sn=sn: self.notifier(sn, args),
+                lambda *args, sn=sn: (invalidate(self, sn), self.notifier(sn, args)),
             )
 
+        self._signal_connectors["playback-status"] = self._player.connect(
+            "playback-status",
+            lambda *args: (
+                invalidate(self, "playback-status"),
+                self.resync_position(),
+                self.notifier("playback-status"),
+            ),
+        )
+        self._signal_connectors["seeked"] = self._player.connect(
+            "seeked",
+            self.on_seeked,
+        )
+        self.resync_position()
+        self._bus_name = (
+            f"org.mpris.MediaPlayer2.{player.get_property('player-instance')}"
+        )
+        self.probe_capabilities()
+
         self._signal_connectors["exit"] = self._player.connect(
             "exit",
             self.on_player_exit,
         )
         self._signal_connectors["metadata"] = self._player.connect(
             "metadata",
-            lambda *args: self.update_status(),
+            self.on_metadata,
+        )
+        self.update_status_once()
+
+    def on_seeked(self, player, position: int):
+        self._clock.anchor(position, self._is_playing())
+        self.notifier("position")
+
+    def _is_playing(self) -> bool:
+        return (
+            self._player.get_property("playback-status")
+            == Playerctl.PlaybackStatus.PLAYING
         )
-        GLib.idle_add(lambda *args: self.update_status_once())
+
+    def resync_position(self) -> bool:
+        # The only place besides seeking that asks the player for its position
+        playing = self._is_playing()
+        actual = self._player.get_property("position")
+        if abs(actual - self._clock.predict()) > self._max_drift:
+            self._resync_interval = POSITION_RESYNC_MIN
+            self.notifier("position")
+        else:
+            self._resync_interval = min(
+                self._resync_interval * 2, POSITION_RESYNC_MAX
+            )
+        self._clock.anchor(actual, playing)
+
+        if self._resync_id is not None:
+            GLib.source_remove(self._resync_id)
+            self._resync_id = None
+        if playing:
+            self._resync_id = GLib.timeout_add_seconds(
+                self._resync_interval, self._on_resync
+            )
+        return False
+
+    def _on_resync(self):
+        self._resync_id = None
+        return self.resync_position()
+
+    def probe_capabilities(self):
+        # Reads Shuffle/LoopStatus writability from introspection once per
+        # bus name instead of test-writing them on every read
+        if self._bus_name in _capabilities:
+            return
+        try:
+            bus = Gio.bus_get_sync(Gio.BusType.SESSION, None)
+        except GLib.Error as e:
+            logger.warning(f"[MprisPlayer] Can't probe {self._bus_name}: {e.message}")
+            return
+        bus.call(
+            self._bus_name,
+            MPRIS_PATH,
+            "org.freedesktop.DBus.Introspectable",
+            "Introspect",
+            None,
+            GLib.VariantType("(s)"),
+            Gio.DBusCallFlags.NONE,
+            -1,
+            None,
+            self._on_introspected,
+        )
+
+    def _on_introspected(self, bus: Gio.DBusConnection, result: Gio.AsyncResult):
+        if not hasattr(self, "_player"):
+            return
+        try:
+            xml = bus.call_finish(result).unpack()[0]
+            interface = Gio.DBusNodeInfo.new_for_xml(xml).lookup_interface(
+                MPRIS_PLAYER_INTERFACE
+            )
+        except GLib.Error as e:
+            logger.warning(f"[MprisPlayer] Can't probe {self._bus_name}: {e.message}")
+            interface = None
+
+        def writable(name: str) -> bool:
+            prop = interface.lookup_property(name) if interface else None
+            return bool(prop and prop.flags & Gio.DBusPropertyInfoFlags.WRITABLE)
+
+        can_control = bool(self._player.get_property("can-control"))
+        _capabilities[self._bus_name] = {
+            "shuffle": can_control and writable("Shuffle"),
+            "loop": can_control and writable("LoopStatus"),
+        }
+        self.notifier("can-shuffle")
+        self.notifier("can-loop")
+
+    def on_metadata(self, player, metadata=None):
+        self._meta = TrackMetadata(
+            metadata if metadata is not None else player.get_property("metadata")
+        )
+        self._resync_interval = POSITION_RESYNC_MIN
+        self.resync_position()
+        self.update_status()
 
     def update_status(self):
-        # schedule each notifier asynchronously.
-        def notify_property(prop):
-            if self.get_property(prop) is not None:
-                self.notifier(prop)
         for prop in [
             "metadata",
+            "track",
             "title",
             "artist",
+            "album",
             "arturl",
             "length",
-        ]:
-            GLib.idle_add(lambda p=prop: (notify_property(p), False))
-        for prop in [
             "can-seek",
             "can-pause",
-            "can-shuffle",
             "can-go-next",
             "can-go-previous",
         ]:
-            GLib.idle_add(lambda p=prop: (self.notifier(p), False))
+            self.notifier(prop)
 
     def update_status_once(self):
-        # schedule notifier calls for each property
-        def notify_all():
-            for prop in self.list_properties():  # type: ignore
-                self.notifier(prop.name)
-            return False
-        GLib.idle_add(notify_all, priority=GLib.PRIORITY_DEFAULT_IDLE)
+        for prop in self.list_properties():  # type: ignore
+            self.notifier(prop.name)
 
     def notifier(self, name: str, args=None):
-        def notify_and_emit():
+        # mark the property dirty, everything dirty is flushed in one go
+        self._dirty.add(name)
+        if self._flush_id is None:
+            self._flush_id = GLib.idle_add(
+                self._flush, priority=GLib.PRIORITY_DEFAULT_IDLE
+            )
+
+    def _flush(self):
+        self._flush_id = None
+        names, self._dirty = sorted(self._dirty), set()
+        for name in names:
             self.notify(name)
-            self.emit("changed")
-            return False
-        GLib.idle_add(notify_and_emit, priority=GLib.PRIORITY_DEFAULT_IDLE)
+        self.emit("changed", names)
+        return False
 
     def on_player_exit(self, player):
+        if self._resync_id is not None:
+            GLib.source_remove(self._resync_id)
+            self._resync_id = None
+        if self._flush_id is not None:
+            GLib.source_remove(self._flush_id)
+            self._flush_id = None
         for id in list(self._signal_connectors.values()):
             with contextlib.suppress(Exception):
                 self._player.disconnect(id)
@@ -129,45 +331,43 @@ class MprisPlayer(Service):
 
     @Property(int, "read-write", default_value=0)
     def position(self) -> int:
-        return self._player.get_property("position")  # type: ignore
+        # Extrapolated locally, no D-Bus round trip
+        position = self._clock.predict()
+        length = self._meta.length
+        return min(position, length) if length else position
 
     @position.setter
     def position(self, new_pos: int):
         self._player.set_position(new_pos)
+        self._clock.anchor(new_pos, self._is_playing())
 
     @Property(object, "readable")
     def metadata(self) -> dict:
-        return self._player.get_property("metadata")  # type: ignore
+        return self._meta.raw
+
+    @Property(object, "readable")
+    def track(self) -> TrackMetadata:
+        return self._meta
 
     @Property(str or None, "readable")
     def arturl(self) -> str | None:
-        if "mpris:artUrl" in self.metadata.keys():  # type: ignore  # noqa: SIM118
-            return self.metadata["mpris:artUrl"]  # type: ignore
-        return None
+        return self._meta.arturl
 
     @Property(str or None, "readable")
     def length(self) -> str | None:
-        if "mpris:length" in self.metadata.keys():  # type: ignore  # noqa: SIM118
-            return self.metadata["mpris:length"]  # type: ignore
-        return None
+        return self._meta.length
 
     @Property(str, "readable")
     def artist(self) -> str:
-        artist = self._player.get_artist()  # type: ignore
-        if isinstance(artist, (list, tuple)):
-            return ", ".join(artist)
-        return artist
+        return self._meta.artist
 
     @Property(str, "readable")
     def album(self) -> str:
-        return self._player.get_album()  # type: ignore
+        return self._meta.album
 
     @Property(str, "readable")
     def title(self) -> str:
-        if self._player is None:
-            return ""
-        title_data = self._player.get_title()
-        return title_data if isinstance(title_data, str) else ""
+        return self._meta.title
 
     @Property(bool, "read-write", default_value=False)
     def shuffle(self) -> bool:
@@ -179,29 +379,24 @@ class MprisPlayer(Service):
         return self._player.set_shuffle(do_shuffle)
 
     @Property(str, "readable")
+    @derived("playback-status")
     def playback_status(self) -> str:
-        return {
-            Playerctl.PlaybackStatus.PAUSED: "paused",
-            Playerctl.PlaybackStatus.PLAYING: "playing",
-            Playerctl.PlaybackStatus.STOPPED: "stopped",
-        }.get(self._player.get_property("playback_status"), "unknown")  # type: ignore
+        return PLAYBACK_STATUSES.get(
+            self._player.get_property("playback_status"), "unknown"
+        )  # type: ignore
 
     @Property(str, "read-write")
+    @derived("loop-status")
     def loop_status(self) -> str:
-        return {
-            Playerctl.LoopStatus.NONE: "none",
-            Playerctl.LoopStatus.TRACK: "track",
-            Playerctl.LoopStatus.PLAYLIST: "playlist",
-        }.get(self._player.get_property("loop_status"), "unknown")  # type: ignore
+        return LOOP_STATUSES.get(
+            self._player.get_property("loop_status"), "unknown"
+        )  # type: ignore
 
     @loop_status.setter
     def loop_status(self, status: str):
-        loop_status = {
-            "none": Playerctl.LoopStatus.NONE,
-            "track": Playerctl.LoopStatus.TRACK,
-            "playlist": Playerctl.LoopStatus.PLAYLIST,
-        }.get(status)
-        self._player.set_loop_status(loop_status) if loop_status else None
+        loop_status = LOOP_STATUS_VALUES.get(status)
+        if loop_status is not None:
+            self._player.set_loop_status(loop_status)
 
     @Property(bool, "readable", default_value=False)
     def can_go_next(self) -> bool:
@@ -221,26 +416,18 @@ class MprisPlayer(Service):
 
     @Property(bool, "readable", default_value=False)
     def can_shuffle(self) -> bool:
-        try:
-            self._player.set_shuffle(self._player.get_property("shuffle"))
-            return True
-        except Exception:
-            return False
+        return _capabilities.get(self._bus_name, {}).get("shuffle", False)
 
     @Property(bool, "readable", default_value=False)
     def can_loop(self) -> bool:
-        try:
-            self._player.set_shuffle(self._player.get_property("shuffle"))
-            return True
-        except Exception:
-            return False
+        return _capabilities.get(self._bus_name, {}).get("loop", False)
 
 
 class MprisPlayerManager(Service):
-    """A service to manage mpris players."""
+    """A service to manage mpris players, one MprisPlayer per bus name."""
 
     @Signal
-    def player_appeared(self, player: Playerctl.Player) -> Playerctl.Player: ...
+    def player_appeared(self, player: object) -> object: ...
 
     @Signal
     def player_vanished(self, player_name: str) -> str: ...
@@ -249,6 +436,11 @@ class MprisPlayerManager(Service):
         self,
         **kwargs,
     ):
+        super().__init__(**kwargs)
+        # bus instance name -> (wrapper, changed handler id)
+        self._players: dict[str, tuple[MprisPlayer, int]] = {}
+        # instance names, least recently active first
+        self._activity: list[str] = []
         self._manager = Playerctl.PlayerManager.new()
         bulk_connect(
             self._manager,
@@ -258,22 +450,75 @@ class MprisPlayerManager(Service):
             },
         )
         self.add_players()
-        super().__init__(**kwargs)
 
     def on_name_appeard(self, manager, player_name: Playerctl.PlayerName):
         logger.info(f"[MprisPlayer] {player_name.name} appeared")
-        new_player = Playerctl.Player.new_from_name(player_name)
-        manager.manage_player(new_player)
-        self.emit("player-appeared", new_player)  # type: ignore
+        invalidate_capabilities(player_name.instance)
+        wrapper = self._add_player(player_name)
+        self.notify("players")
+        self.emit("player-appeared", wrapper)  # type: ignore
 
     def on_name_vanished(self, manager, player_name: Playerctl.PlayerName):
         logger.info(f"[MprisPlayer] {player_name.name} vanished")
+        entry = self._players.pop(player_name.instance, None)
+        if entry is not None:
+            wrapper, handler_id = entry
+            with contextlib.suppress(Exception):
+                wrapper.disconnect(handler_id)
+        was_active = self._activity[-1:] == [player_name.instance]
+        if player_name.instance in self._activity:
+            self._activity.remove(player_name.instance)
+        self.notify("players")
+        if was_active:
+            self.notify("active-player")
         self.emit("player-vanished", player_name.name)  # type: ignore
 
+    def _add_player(self, player_name: Playerctl.PlayerName) -> MprisPlayer:
+        instance = player_name.instance
+        if instance in self._players:
+            return self._players[instance][0]
+        player = Playerctl.Player.new_from_name(player_name)
+        self._manager.manage_player(player)
+        wrapper = MprisPlayer(player)
+        handler_id = wrapper.connect(
+            "changed", lambda _, names: self._on_player_changed(instance, names)
+        )
+        self._players[instance] = (wrapper, handler_id)
+        # The first player, or one that is already playing, becomes active
+        active = self._activity[-1:]
+        self._activity.insert(0, instance)
+        if wrapper.playback_status == "playing":
+            self._activity.append(self._activity.pop(0))
+        if self._activity[-1:] != active:
+            self.notify("active-player")
+        return wrapper
+
+    def _on_player_changed(self, instance: str, names: list[str]):
+        if "playback-status" not in names or instance not in self._players:
+            return
+        if self._players[instance][0].playback_status == "playing":
+            self._bump(instance)
+
+    def _bump(self, instance: str):
+        # The most recently started player becomes the active one
+        if self._activity[-1:] == [instance]:
+            return
+        self._activity.remove(instance)
+        self._activity.append(instance)
+        self.notify("active-player")
+
     def add_players(self):
-        for player in self._manager.get_property("player-names"):  # type: ignore
-            self._manager.manage_player(Playerctl.Player.new_from_name(player))  # type: ignore
+        for player_name in self._manager.get_property("player-names"):  # type: ignore
+            self._add_player(player_name)
+
+    def get_player(self, instance: str) -> MprisPlayer | None:
+        entry = self._players.get(instance)
+        return entry[0] if entry else None
+
+    @Property(object, "readable")
+    def players(self) -> list[MprisPlayer]:
+        return [wrapper for wrapper, _ in self._players.values()]
 
     @Property(object, "readable")
-    def players(self):
-        return self._manager.get_property("players")  # type: ignore
+    def active_player(self) -> MprisPlayer | None:
+        return self.get_player(self._activity[-1]) if self._activity else None
@@ -1,16 +1,243 @@
-from typing import Any, List, Literal
+import time
+from types import MappingProxyType
+from typing import Any, Literal
 
 import gi
 from fabric.core.service import Property, Service, Signal
-from fabric.utils import bulk_connect, exec_shell_command_async
-from gi.repository import Gio
+from gi.repository import Gio, GLib
 from loguru import logger
 
+from services.derived import derived, invalidate
+
+
+class NetworkManagerImportError(ImportError):
+    """An error to raise when the NetworkManager typelib is not installed."""
+    def __init__(self, *args):
+        super().__init__(
+            "NetworkManager (libnm) is not installed, please install it first",
+            *args,
+        )
+
 try:
     gi.require_version("NM", "1.0")
     from gi.repository import NM
 except ValueError:
     logger.error("Failed to start network manager")
+    raise NetworkManagerImportError
+
+WIFI_SIGNAL_ICONS = {
+    80: "network-wireless-signal-excellent-symbolic",
+    60: "network-wireless-signal-good-symbolic",
+    40: "network-wireless-signal-ok-symbolic",
+    20: "network-wireless-signal-weak-symbolic",
+    00: "network-wireless-signal-none-symbolic",
+}
+
+
+# How far (in %) strength has to move past a bucket edge before the bucket changes
+STRENGTH_HYSTERESIS = 5
+
+
+def wifi_signal_icon(strength: int) -> str:
+    return WIFI_SIGNAL_ICONS.get(
+        min(80, 20 * round(strength / 20)),
+        "network-wireless-no-route-symbolic",
+    )
+
+
+def strength_bucket(strength: int, previous: int | None, hysteresis: int) -> int:
+    # Snaps strength to a 20% bucket, sticking to the previous bucket while
+    # strength stays within `hysteresis` of its edges
+    bucket = min(80, 20 * round(strength / 20))
+    if previous is None or bucket == previous:
+        return bucket
+    if previous - 10 - hysteresis <= strength < previous + 10 + hysteresis:
+        return previous
+    return bucket
+
+
+def publish_changes(service: Service, published: dict, values: dict) -> bool:
+    # Notifies only the properties whose value differs from the last published one
+    changed = [name for name, value in values.items() if published.get(name) != value]
+    published.update(values)
+    for name in changed:
+        service.notify(name)
+    return bool(changed)
+
+ACTIVE_CONNECTION_STATES = {
+    NM.ActiveConnectionState.ACTIVATED: "activated",
+    NM.ActiveConnectionState.ACTIVATING: "activating",
+    NM.ActiveConnectionState.DEACTIVATING: "deactivating",
+    NM.ActiveConnectionState.DEACTIVATED: "deactivated",
+}
+
+DEVICE_STATES = {
+    NM.DeviceState.UNMANAGED: "unmanaged",
+    NM.DeviceState.UNAVAILABLE: "unavailable",
+    NM.DeviceState.DISCONNECTED: "disconnected",
+    NM.DeviceState.PREPARE: "prepare",
+    NM.DeviceState.CONFIG: "config",
+    NM.DeviceState.NEED_AUTH: "need_auth",
+    NM.DeviceState.IP_CONFIG: "ip_config",
+    NM.DeviceState.IP_CHECK: "ip_check",
+    NM.DeviceState.SECONDARIES: "secondaries",
+    NM.DeviceState.ACTIVATED: "activated",
+    NM.DeviceState.DEACTIVATING: "deactivating",
+    NM.DeviceState.FAILED: "failed",
+}
+
+
+def set_wifi_password(
+    security: NM.SettingWirelessSecurity, ap: NM.AccessPoint, password: str
+):
+    # key-mgmt follows what the AP advertises, SAE-only networks reject wpa-psk
+    flags = getattr(NM, "80211ApSecurityFlags")
+    rsn, wpa = ap.get_rsn_flags(), ap.get_wpa_flags()
+    if (rsn | wpa) & flags.KEY_MGMT_PSK:
+        key_mgmt, secret = "wpa-psk", "psk"
+    elif rsn & flags.KEY_MGMT_SAE:
+        key_mgmt, secret = "sae", "psk"
+    else:
+        key_mgmt, secret = "none", "wep-key0"
+    security.set_property("key-mgmt", key_mgmt)
+    security.set_property(secret, password)
+
+
+def active_connection_state(device: NM.Device, default: str) -> str:
+    connection = device.get_active_connection()
+    if connection is None:
+        return default
+    return ACTIVE_CONNECTION_STATES.get(connection.get_state(), default)
+
+# Scan results younger than this (s) are served from the cache
+SCAN_FRESHNESS = 30
+
+# Rescan interval (s) while the network menu is open, and the backoff ceiling
+SCAN_INTERVAL = 20
+SCAN_BACKOFF_MAX = 300
+
+
+def boottime() -> float:
+    # NM stamps scans and last_seen with CLOCK_BOOTTIME
+    return time.clock_gettime(time.CLOCK_BOOTTIME)
+
+
+class AccessPointIndex:
+    """Access points keyed by BSSID, kept up to date incrementally.
+
+    Entries are read-only mappings, and snapshots are tuples cached until
+    `version` changes, so repeated reads cost nothing. Snapshot entries also
+    carry "active" and, as before the index, the active AP as "active-ap".
+    """
+
+    def __init__(self, on_change):
+        self._on_change = on_change
+        self._entries: dict[str, MappingProxyType] = {}
+        self._handlers: dict[str, tuple[NM.AccessPoint, int]] = {}
+        self._active: NM.AccessPoint | None = None
+        self._active_bssid = ""
+        self._snapshot: tuple | None = None
+        self._by_ssid: tuple | None = None
+        self.version = 0
+
+    @staticmethod
+    def _make_entry(ap: NM.AccessPoint, bssid: str) -> MappingProxyType:
+        ssid = ap.get_ssid()
+        strength = ap.get_strength()
+        return MappingProxyType(
+            {
+                "bssid": bssid,
+                "last_seen": ap.get_last_seen(),
+                "ssid": NM.utils_ssid_to_utf8(ssid.get_data()) if ssid else "Unknown",
+                "strength": strength,
+                "frequency": ap.get_frequency(),
+                "icon-name": wifi_signal_icon(strength),
+            }
+        )
+
+    def _changed(self, members: bool = False):
+        # `members` tells the owner the set of access points changed, not
+        # only what is known about them
+        self.version += 1
+        self._snapshot = self._by_ssid = None
+        self._on_change(members)
+
+    def add(self, ap: NM.AccessPoint):
+        bssid = ap.get_bssid()
+        if bssid in self._handlers:
+            return
+        self._entries[bssid] = self._make_entry(ap, bssid)
+        self._handlers[bssid] = (
+            ap,
+            ap.connect("notify::strength", lambda ap, *_: self.update(ap, bssid)),
+        )
+        self._changed(members=True)
+
+    def remove(self, ap: NM.AccessPoint):
+        bssid = ap.get_bssid()
+        entry = self._handlers.pop(bssid, None)
+        if entry is None:
+            return
+        entry[0].disconnect(entry[1])
+        del self._entries[bssid]
+        self._changed(members=True)
+
+    def update(self, ap: NM.AccessPoint, bssid: str):
+        entry = self._make_entry(ap, bssid)
+        if entry != self._entries.get(bssid):
+            self._entries[bssid] = entry
+            self._changed()
+
+    def refresh(self):
+        # Re-reads every AP, e.g. after a scan refreshed their last_seen
+        changed = False
+        for bssid, (ap, _) in self._handlers.items():
+            entry = self._make_entry(ap, bssid)
+            if entry != self._entries[bssid]:
+                self._entries[bssid] = entry
+                changed = True
+        if changed:
+            self._changed()
+
+    def set_active(self, ap: NM.AccessPoint | None):
+        if ap is self._active:
+            return
+        self._active = ap
+        self._active_bssid = ap.get_bssid() if ap else ""
+        self._changed()
+
+    def clear(self):
+        for ap, handler_id in self._handlers.values():
+            ap.disconnect(handler_id)
+        self._handlers.clear()
+        self._entries.clear()
+        self._active, self._active_bssid = None, ""
+        self._changed(members=True)
+
+    def snapshot(self) -> tuple:
+        if self._snapshot is None:
+            self._snapshot = tuple(
+                MappingProxyType(
+                    {
+                        **entry,
+                        "active": entry["bssid"] == self._active_bssid,
+                        "active-ap": self._active,
+                    }
+                )
+                for entry in sorted(
+                    self._entries.values(), key=lambda e: e["strength"], reverse=True
+                )
+            )
+        return self._snapshot
+
+    def by_ssid(self) -> tuple:
+        # One entry per network name, the strongest BSSID wins
+        if self._by_ssid is None:
+            best: dict[str, MappingProxyType] = {}
+            for entry in self.snapshot():
+                best.setdefault(entry["ssid"], entry)
+            self._by_ssid = tuple(best.values())
+        return self._by_ssid
 
 
 class Wifi(Service):
@@ -22,53 +249,129 @@ class Wifi(Service):
     @Signal
     def enabled(self) -> bool: ...
 
-    def __init__(self, client: NM.Client, device: NM.DeviceWifi, **kwargs):
+    def __init__(
+        self,
+        client: NM.Client,
+        device: NM.DeviceWifi,
+        hysteresis: int = STRENGTH_HYSTERESIS,
+        **kwargs,
+    ):
         self._client: NM.Client = client
         self._device: NM.DeviceWifi = device
         self._ap: NM.AccessPoint | None = None
         self._ap_signal: int | None = None
+        self._ap_flush_id: int | None = None
+        self._ap_set_changed = False
+        self._hysteresis = hysteresis
+        self._bucket: int | None = None
+        self._published: dict = {}
+        self._scan_pending = False
+        self._scan_timer: int | None = None
+        self._scan_failures = 0
+        self._menu_open = False
         super().__init__(**kwargs)
+        self._ap_index = AccessPointIndex(self._queue_ap_flush)
 
-        self._client.connect(
-            "notify::wireless-enabled",
-            lambda *args: self.notifier("enabled", args),
-        )
+        self._handlers: list[tuple[Any, int]] = [
+            (
+                self._client,
+                self._client.connect(
+                    "notify::wireless-enabled",
+                    lambda *args: self._source_changed("notify::wireless-enabled"),
+                ),
+            )
+        ]
         if self._device:
-            bulk_connect(
-                self._device,
-                {
+            self._handlers += [
+                (self._device, self._device.connect(name, callback))
+                for name, callback in {
                     "notify::active-access-point": lambda *args: self._activate_ap(),
-                    "access-point-added": lambda *args: self.emit("changed"),
-                    "access-point-removed": lambda *args: self.emit("changed"),
-                    "state-changed": lambda *args: self.ap_update(),
-                },
-            )
+                    "access-point-added": lambda _, ap: self._ap_index.add(ap),
+                    "access-point-removed": lambda _, ap: self._ap_index.remove(ap),
+                    "state-changed": lambda *args: self._source_changed(
+                        "state-changed"
+                    ),
+                    "notify::active-connection": lambda *args: self._source_changed(
+                        "notify::active-connection"
+                    ),
+                }.items()
+            ]
+            for ap in self._device.get_access_points():
+                self._ap_index.add(ap)
             self._activate_ap()
 
+    def destroy(self):
+        # Drops every handler and source, for when the device goes away
+        for obj, handler_id in self._handlers:
+            obj.disconnect(handler_id)
+        self._handlers.clear()
+        if self._ap:
+            self._ap.disconnect(self._ap_signal)
+            self._ap = None
+        self._ap_index.clear()
+        for source_id in (self._ap_flush_id, self._scan_timer):
+            if source_id is not None:
+                GLib.source_remove(source_id)
+        self._ap_flush_id = self._scan_timer = None
+        self._menu_open = False
+
+    def _queue_ap_flush(self, members: bool = False):
+        # Index changes are published once per main-loop cycle
+        self._ap_set_changed |= members
+        if self._ap_flush_id is None:
+            self._ap_flush_id = GLib.idle_add(self._flush_ap_index)
+
+    def _flush_ap_index(self):
+        self._ap_flush_id = None
+        self.notify("access-points")
+        self.notify("networks")
+        # Strength updates alone only notify, list widgets listening on
+        # `changed` reload when access points come, go or a scan is answered
+        if self._ap_set_changed:
+            self._ap_set_changed = False
+            self.notify("last-scan-age")
+            self.emit("changed")
+        return False
+
+    def _source_changed(self, source: str):
+        invalidate(self, source)
+        self.ap_update()
+
     def ap_update(self):
-        self.emit("changed")
-        for sn in [
-            "enabled",
-            "internet",
-            "strength",
-            "frequency",
-            "access-points",
-            "ssid",
-            "state",
-            "icon-name",
-        ]:
-            self.notify(sn)
+        bucket = (
+            strength_bucket(self.strength, self._bucket, self._hysteresis)
+            if self._ap
+            else None
+        )
+        if bucket != self._bucket:
+            self._bucket = bucket
+            invalidate(self, "bucket")
+        values = {
+            "enabled": self.enabled,
+            "internet": self.internet,
+            "strength": self._bucket,
+            "frequency": self.frequency,
+            "ssid": self.ssid,
+            "state": self.state,
+            "icon-name": self.icon_name,
+        }
+        if publish_changes(self, self._published, values):
+            self.emit("changed")
 
     def _activate_ap(self):
         if self._ap:
             self._ap.disconnect(self._ap_signal)
         self._ap = self._device.get_active_access_point()
-        if not self._ap:
-            return
-
-        self._ap_signal = self._ap.connect(
-            "notify::strength", lambda *args: self.ap_update()
-        )  # type: ignore
+        self._ap_index.set_active(self._ap)
+        self._bucket = None
+        invalidate(self, "notify::active-access-point", "bucket")
+        self.notify("active-bssid")
+        if self._ap:
+            self._ap_signal = self._ap.connect(
+                "notify::strength",
+                lambda *args: self._source_changed("notify::strength"),
+            )  # type: ignore
+        self.ap_update()
 
     def toggle_wifi(self):
         self._client.wireless_set_enabled(not self._client.wireless_get_enabled())
@@ -76,14 +379,75 @@ class Wifi(Service):
     # def set_active_ap(self, ap):
     #     self._device.access
 
-    def scan(self):
-        self._device.request_scan_async(
-            None,
-            lambda device, result: [
-                device.request_scan_finish(result),
-                self.emit("changed"),
-            ],
-        )
+    def scan(self, force: bool = False):
+        """Scan for access points, reported by `changed` once done.
+
+        Concurrent requests merge into the scan already in flight, and fresh
+        results are served from the index without touching the radio. Pass
+        `force` for a refresh the user asked for.
+        """
+        if self._scan_pending:
+            return
+        if not force and self.last_scan_age < SCAN_FRESHNESS:
+            self._queue_ap_flush(members=True)
+            return
+        if self._device.get_state() in (
+            NM.DeviceState.PREPARE,
+            NM.DeviceState.CONFIG,
+            NM.DeviceState.NEED_AUTH,
+            NM.DeviceState.IP_CONFIG,
+            NM.DeviceState.IP_CHECK,
+            NM.DeviceState.SECONDARIES,
+        ):
+            # NM refuses scans while connecting, serve what is known and
+            # try again later
+            self._scan_failures += 1
+            self._schedule_scan()
+            self._queue_ap_flush(members=True)
+            return
+        self._scan_pending = True
+        self._device.request_scan_async(None, self._on_scan_done)
+
+    def _on_scan_done(self, device: NM.DeviceWifi, result: Gio.AsyncResult):
+        self._scan_pending = False
+        try:
+            device.request_scan_finish(result)
+            self._scan_failures = 0
+        except GLib.Error as e:
+            # Usually NM throttling scans that came too close together
+            self._scan_failures += 1
+            logger.debug(f"[Wifi] Scan rejected: {e.message}")
+        self._ap_index.refresh()
+        self._queue_ap_flush(members=True)
+        self._schedule_scan()
+
+    def _schedule_scan(self):
+        if self._scan_timer is not None:
+            GLib.source_remove(self._scan_timer)
+            self._scan_timer = None
+        if not self._menu_open:
+            return
+        interval = min(SCAN_INTERVAL * 2**self._scan_failures, SCAN_BACKOFF_MAX)
+        self._scan_timer = GLib.timeout_add_seconds(interval, self._on_scan_timer)
+
+    def _on_scan_timer(self):
+        self._scan_timer = None
+        self.scan()
+        if self._scan_timer is None and not self._scan_pending:
+            self._schedule_scan()
+        return False
+
+    def set_menu_open(self, is_open: bool):
+        # Periodic rescans only run while something shows the network list
+        self._menu_open = is_open
+        if is_open:
+            self.scan()
+        self._schedule_scan()
+
+    def age_of(self, entry) -> float:
+        """Seconds since an access point entry was last seen by a scan."""
+        last_seen = entry["last_seen"]
+        return boottime() - last_seen if last_seen >= 0 else float("inf")
 
     def notifier(self, name: str, *args):
         self.notify(name)
@@ -91,6 +455,7 @@ class Wifi(Service):
         return
 
     @Property(bool, "read-write", default_value=False)
+    @derived("notify::wireless-enabled")
     def enabled(self) -> bool:  # type: ignore
         return bool(self._client.wireless_get_enabled())
 
@@ -99,24 +464,19 @@ class Wifi(Service):
         self._client.wireless_set_enabled(value)
 
     @Property(int, "readable")
+    @derived("notify::active-access-point", "notify::strength")
     def strength(self):
         return self._ap.get_strength() if self._ap else -1
 
     @Property(str, "readable")
+    @derived("notify::active-access-point", "internet", "bucket")
     def icon_name(self):
         if not self._ap:
             return "network-wireless-disabled-symbolic"
 
         if self.internet == "activated":
-            return {
-                80: "network-wireless-signal-excellent-symbolic",
-                60: "network-wireless-signal-good-symbolic",
-                40: "network-wireless-signal-ok-symbolic",
-                20: "network-wireless-signal-weak-symbolic",
-                00: "network-wireless-signal-none-symbolic",
-            }.get(
-                min(80, 20 * round(self._ap.get_strength() / 20)),
-                "network-wireless-no-route-symbolic",
+            return WIFI_SIGNAL_ICONS.get(
+                self._bucket, "network-wireless-no-route-symbolic"
             )
         if self.internet == "activating":
             return "network-wireless-acquiring-symbolic"
@@ -124,51 +484,43 @@ class Wifi(Service):
         return "network-wireless-offline-symbolic"
 
     @Property(int, "readable")
+    @derived("notify::active-access-point")
     def frequency(self):
         return self._ap.get_frequency() if self._ap else -1
 
     @Property(int, "readable")
+    @derived("state-changed", "notify::active-connection")
     def internet(self):
-        return {
-            NM.ActiveConnectionState.ACTIVATED: "activated",
-            NM.ActiveConnectionState.ACTIVATING: "activating",
-            NM.ActiveConnectionState.DEACTIVATING: "deactivating",
-            NM.ActiveConnectionState.DEACTIVATED: "deactivated",
-        }.get(
-            self._device.get_active_connection().get_state(),
-            "unknown",
-        )
+        return active_connection_state(self._device, "unknown")
 
     @Property(object, "readable")
-    def access_points(self) -> List[object]:
-        points: list[NM.AccessPoint] = self._device.get_access_points()
+    def access_points(self) -> tuple:
+        # Immutable snapshot sorted by strength, rebuilt only when it changed
+        return self._ap_index.snapshot()
 
-        def make_ap_dict(ap: NM.AccessPoint):
-            return {
-                "bssid": ap.get_bssid(),
-                # "address": ap.get_
-                "last_seen": ap.get_last_seen(),
-                "ssid": NM.utils_ssid_to_utf8(ap.get_ssid().get_data())
-                if ap.get_ssid()
-                else "Unknown",
-                "active-ap": self._ap,
-                "strength": ap.get_strength(),
-                "frequency": ap.get_frequency(),
-                "icon-name": {
-                    80: "network-wireless-signal-excellent-symbolic",
-                    60: "network-wireless-signal-good-symbolic",
-                    40: "network-wireless-signal-ok-symbolic",
-                    20: "network-wireless-signal-weak-symbolic",
-                    00: "network-wireless-signal-none-symbolic",
-                }.get(
-                    min(80, 20 * round(ap.get_strength() / 20)),
-                    "network-wireless-no-route-symbolic",
-                ),
-            }
+    @Property(object, "readable")
+    def networks(self) -> tuple:
+        # One entry per SSID, keeping the strongest access point
+        return self._ap_index.by_ssid()
+
+    @Property(float, "readable")
+    def last_scan_age(self) -> float:
+        last_scan = self._device.get_last_scan() / 1000
+        if last_scan < 0:
+            last_scan = max((e["last_seen"] for e in self.access_points), default=-1)
+        return boottime() - last_scan if last_scan >= 0 else float("inf")
 
-        return list(map(make_ap_dict, points))
+    @Property(int, "readable")
+    def access_points_version(self) -> int:
+        return self._ap_index.version
+
+    @Property(str, "readable")
+    @derived("notify::active-access-point")
+    def active_bssid(self) -> str:
+        return self._ap.get_bssid() if self._ap else ""
 
     @Property(str, "readable")
+    @derived("notify::active-access-point")
     def ssid(self):
         if not self._ap:
             return "Disconnected"
@@ -176,21 +528,9 @@ class Wifi(Service):
         return NM.utils_ssid_to_utf8(ssid) if ssid else "Unknown"
 
     @Property(int, "readable")
+    @derived("state-changed")
     def state(self):
-        return {
-            NM.DeviceState.UNMANAGED: "unmanaged",
-            NM.DeviceState.UNAVAILABLE: "unavailable",
-            NM.DeviceState.DISCONNECTED: "disconnected",
-            NM.DeviceState.PREPARE: "prepare",
-            NM.DeviceState.CONFIG: "config",
-            NM.DeviceState.NEED_AUTH: "need_auth",
-            NM.DeviceState.IP_CONFIG: "ip_config",
-            NM.DeviceState.IP_CHECK: "ip_check",
-            NM.DeviceState.SECONDARIES: "secondaries",
-            NM.DeviceState.ACTIVATED: "activated",
-            NM.DeviceState.DEACTIVATING: "deactivating",
-            NM.DeviceState.FAILED: "failed",
-        }.get(self._device.get_state(), "unknown")
+        return DEVICE_STATES.get(self._device.get_state(), "unknown")
 
 
 class Ethernet(Service):
@@ -203,22 +543,17 @@ class Ethernet(Service):
     def enabled(self) -> bool: ...
 
     @Property(int, "readable")
+    @derived("notify::speed")
     def speed(self) -> int:
         return self._device.get_speed()
 
     @Property(str, "readable")
+    @derived("notify::state", "notify::active-connection")
     def internet(self) -> str:
-        return {
-            NM.ActiveConnectionState.ACTIVATED: "activated",
-            NM.ActiveConnectionState.ACTIVATING: "activating",
-            NM.ActiveConnectionState.DEACTIVATING: "deactivating",
-            NM.ActiveConnectionState.DEACTIVATED: "deactivated",
-        }.get(
-            self._device.get_active_connection().get_state(),
-            "disconnected",
-        )
+        return active_connection_state(self._device, "disconnected")
 
     @Property(str, "readable")
+    @derived("internet")
     def icon_name(self) -> str:
         network = self.internet
         if network == "activated":
@@ -236,21 +571,62 @@ class Ethernet(Service):
         super().__init__(**kwargs)
         self._client: NM.Client = client
         self._device: NM.DeviceEthernet = device
+        self._published: dict = {}
 
-        for pn in (
-            "active-connection",
-            "icon-name",
-            "internet",
-            "speed",
-            "state",
-        ):
-            self._device.connect(f"notify::{pn}", lambda *_: self.notifier(pn))
+        self._handlers = [
+            self._device.connect(
+                f"notify::{pn}",
+                lambda *_, pn=pn: (invalidate(self, f"notify::{pn}"), self.update()),
+            )
+            for pn in ("active-connection", "speed", "state")
+        ]
+        self.update()
 
-        self._device.connect("notify::speed", lambda *_: print(_))
+    def destroy(self):
+        for handler_id in self._handlers:
+            self._device.disconnect(handler_id)
+        self._handlers.clear()
 
-    def notifier(self, pn):
-        self.notify(pn)
-        self.emit("changed")
+    def update(self):
+        values = {
+            "speed": self.speed,
+            "internet": self.internet,
+            "icon-name": self.icon_name,
+        }
+        if publish_changes(self, self._published, values):
+            self.emit("changed")
+
+
+class ConnectionProfileIndex:
+    """Saved Wi-Fi profiles looked up by BSSID or SSID, rebuilt lazily."""
+
+    def __init__(self, client: NM.Client):
+        self._client = client
+        self._by_bssid: dict[str, NM.RemoteConnection] = {}
+        self._by_ssid: dict[str, NM.RemoteConnection] = {}
+        self._dirty = True
+        for signal in ("connection-added", "connection-removed"):
+            client.connect(signal, lambda *_: setattr(self, "_dirty", True))
+
+    def _rebuild(self):
+        self._by_bssid.clear()
+        self._by_ssid.clear()
+        for connection in self._client.get_connections():
+            wireless = connection.get_setting_wireless()
+            if wireless is None:
+                continue
+            ssid = wireless.get_ssid()
+            if ssid is not None:
+                self._by_ssid.setdefault(NM.utils_ssid_to_utf8(ssid.get_data()), connection)
+            for bssid in [wireless.get_bssid(), *(wireless.get_seen_bssids() or [])]:
+                if bssid:
+                    self._by_bssid.setdefault(bssid.upper(), connection)
+        self._dirty = False
+
+    def find(self, bssid: str, ssid: str | None) -> NM.RemoteConnection | None:
+        if self._dirty:
+            self._rebuild()
+        return self._by_bssid.get(bssid.upper()) or self._by_ssid.get(ssid)
 
 
 class NetworkClient(Service):
@@ -259,10 +635,32 @@ class NetworkClient(Service):
     @Signal
     def device_ready(self) -> None: ...
 
+    @Signal
+    def device_added(self, iface: str) -> None: ...
+
+    @Signal
+    def device_removed(self, iface: str) -> None: ...
+
+    @Signal
+    def connection_progress(self, bssid: str, state: str) -> None: ...
+
+    @Signal
+    def connection_result(self, bssid: str, success: bool, message: str) -> None: ...
+
     def __init__(self, **kwargs):
         self._client: NM.Client | None = None
-        self.wifi_device: Wifi | None = None
-        self.ethernet_device: Ethernet | None = None
+        self._profiles: ConnectionProfileIndex | None = None
+        self._activation: tuple[str, Gio.Cancellable] | None = None
+        self._active_connection: NM.ActiveConnection | None = None
+        self._active_handler: int | None = None
+        # iface -> NM device, and iface -> service created on first use
+        self._devices: dict[str, NM.Device] = {}
+        self._services: dict[str, Wifi | Ethernet] = {}
+        # iface -> notify::active-connection handler, and the iface picked
+        # per device type
+        self._device_handlers: dict[str, int] = {}
+        self._selected: dict[Any, str | None] = {}
+        self._primary: Literal["wifi", "wired"] | None = None
         super().__init__(**kwargs)
         NM.Client.new_async(
             cancellable=None,
@@ -272,52 +670,231 @@ class NetworkClient(Service):
 
     def _init_network_client(self, client: NM.Client, task: Gio.Task, **kwargs):
         self._client = client
-        wifi_device: NM.DeviceWifi | None = self._get_device(NM.DeviceType.WIFI)  # type: ignore
-        ethernet_device: NM.DeviceEthernet | None = self._get_device(
-            NM.DeviceType.ETHERNET
-        )
-
-        if wifi_device:
-            self.wifi_device = Wifi(self._client, wifi_device)
-            self.emit("device-ready")
+        self._profiles = ConnectionProfileIndex(client)
+        client.connect("device-added", lambda _, device: self._add_device(device))
+        client.connect("device-removed", lambda _, device: self._remove_device(device))
+        client.connect("notify::primary-connection", lambda *_: self._update_primary())
 
-        if ethernet_device:
-            self.ethernet_device = Ethernet(client=self._client, device=ethernet_device)
-            self.emit("device-ready")
+        for device in client.get_devices():
+            self._add_device(device)
+        self._update_primary()
 
-        self.notify("primary-device")
+    def _add_device(self, device: NM.Device):
+        if device.get_device_type() not in (NM.DeviceType.WIFI, NM.DeviceType.ETHERNET):
+            return
+        iface = device.get_iface()
+        self._devices[iface] = device
+        self._device_handlers[iface] = device.connect(
+            "notify::active-connection", lambda *_: self._update_selection()
+        )
+        self._update_selection()
+        logger.info(f"[Network] Device {iface} added")
+        self.emit("device-added", iface)
+        self.emit("device-ready")
+
+    def _remove_device(self, device: NM.Device):
+        iface = device.get_iface()
+        if self._devices.pop(iface, None) is None:
+            return
+        device.disconnect(self._device_handlers.pop(iface))
+        service = self._services.pop(iface, None)
+        if service is not None:
+            service.destroy()
+        self._update_selection()
+        logger.info(f"[Network] Device {iface} removed")
+        self.emit("device-removed", iface)
+
+    def get_service(self, iface: str) -> "Wifi | Ethernet | None":
+        """The Wifi or Ethernet service for `iface`, created on first use."""
+        service = self._services.get(iface)
+        if service is None and iface in self._devices:
+            device = self._devices[iface]
+            if device.get_device_type() == NM.DeviceType.WIFI:
+                service = Wifi(self._client, device)
+            else:
+                service = Ethernet(client=self._client, device=device)
+            self._services[iface] = service
+        return service
 
     def _get_device(self, device_type) -> Any:
-        devices: List[NM.Device] = self._client.get_devices()  # type: ignore
+        # Prefers a device with an active connection, e.g. a docked NIC
+        devices = [d for d in self._devices.values() if d.get_device_type() == device_type]
         return next(
-            (
-                x
-                for x in devices
-                if x.get_device_type() == device_type
-                and x.get_active_connection() is not None
-            ),
-            None,
+            (d for d in devices if d.get_active_connection() is not None),
+            devices[0] if devices else None,
         )
 
+    def _update_selection(self):
+        # The picked device changes when one gains or loses a connection
+        for device_type, name in (
+            (NM.DeviceType.WIFI, "wifi-device"),
+            (NM.DeviceType.ETHERNET, "ethernet-device"),
+        ):
+            device = self._get_device(device_type)
+            iface = device.get_iface() if device else None
+            if iface != self._selected.get(device_type):
+                self._selected[device_type] = iface
+                self.notify(name)
+
+    @Property(object, "readable")
+    def wifi_device(self) -> Wifi | None:
+        iface = self._selected.get(NM.DeviceType.WIFI)
+        return self.get_service(iface) if iface else None
+
+    @Property(object, "readable")
+    def ethernet_device(self) -> Ethernet | None:
+        iface = self._selected.get(NM.DeviceType.ETHERNET)
+        return self.get_service(iface) if iface else None
+
+    @property
+    def devices(self) -> list[str]:
+        return list(self._devices)
+
+    def _update_primary(self):
+        primary = self._get_primary_device()
+        if primary != self._primary:
+            self._primary = primary
+            self.notify("primary-device")
+
     def _get_primary_device(self) -> Literal["wifi", "wired"] | None:
-        if not self._client:
+        connection = self._client.get_primary_connection() if self._client else None
+        if connection is None:
             return None
+        connection_type = str(connection.get_connection_type())
         return (
             "wifi"
-            if "wireless"
-            in str(self._client.get_primary_connection().get_connection_type())
+            if "wireless" in connection_type
             else "wired"
-            if "ethernet"
-            in str(self._client.get_primary_connection().get_connection_type())
+            if "ethernet" in connection_type
             else None
         )
 
-    def connect_wifi_bssid(self, bssid):
-        # We are using nmcli here, idk im lazy
-        exec_shell_command_async(
-            f"nmcli device wifi connect {bssid}", lambda *args: print(args)
+    def connect_wifi_bssid(self, bssid: str, password: str | None = None):
+        """Activate the access point `bssid`, reusing a saved profile when there is one.
+
+        Progress and the outcome are reported through the connection-progress
+        and connection-result signals.
+        """
+        if not (self._client and self.wifi_device):
+            return
+        device: NM.DeviceWifi = self.wifi_device._device
+        ap = next(
+            (a for a in device.get_access_points() if a.get_bssid() == bssid), None
+        )
+        if ap is None:
+            self.emit("connection-result", bssid, False, "Access point not found")
+            return
+
+        self.cancel_connection()
+        cancellable = Gio.Cancellable()
+        self._activation = (bssid, cancellable)
+        ssid = NM.utils_ssid_to_utf8(ap.get_ssid().get_data()) if ap.get_ssid() else None
+        profile = self._profiles.find(bssid, ssid)
+        self.emit("connection-progress", bssid, "activating")
+
+        def activate(*_):
+            self._client.activate_connection_async(
+                profile, device, ap.get_path(), cancellable, self._on_activated, bssid
+            )
+
+        if profile is not None and password is None:
+            activate()
+            return
+
+        if profile is not None:
+            # A new password updates the saved profile instead of adding another
+            security = profile.get_setting_wireless_security()
+            if security is None:
+                security = NM.SettingWirelessSecurity.new()
+                profile.add_setting(security)
+            set_wifi_password(security, ap, password)
+            profile.commit_changes_async(
+                True,
+                cancellable,
+                lambda p, result: self._on_profile_saved(p, result, bssid, activate),
+            )
+            return
+
+        connection = None
+        if password is not None:
+            connection = NM.SimpleConnection.new()
+            security = NM.SettingWirelessSecurity.new()
+            set_wifi_password(security, ap, password)
+            connection.add_setting(security)
+        self._client.add_and_activate_connection_async(
+            connection, device, ap.get_path(), cancellable, self._on_added, bssid
+        )
+
+    def _on_profile_saved(
+        self, profile: NM.RemoteConnection, result: Gio.AsyncResult, bssid, activate
+    ):
+        try:
+            profile.commit_changes_finish(result)
+        except GLib.Error as e:
+            if self._activation and self._activation[0] == bssid:
+                self._activation = None
+                self.emit("connection-result", bssid, False, e.message)
+            return
+        if self._activation and self._activation[0] == bssid:
+            activate()
+
+    def _on_activated(self, client: NM.Client, result: Gio.AsyncResult, bssid: str):
+        self._track_activation(bssid, client.activate_connection_finish, result)
+
+    def _on_added(self, client: NM.Client, result: Gio.AsyncResult, bssid: str):
+        self._track_activation(bssid, client.add_and_activate_connection_finish, result)
+
+    def _track_activation(self, bssid: str, finish, result: Gio.AsyncResult):
+        try:
+            active: NM.ActiveConnection = finish(result)
+        except GLib.Error as e:
+            if self._activation and self._activation[0] == bssid:
+                self._activation = None
+                self.emit("connection-result", bssid, False, e.message)
+            return
+        if not (self._activation and self._activation[0] == bssid):
+            return  # cancelled or superseded meanwhile
+        self._active_connection = active
+        self._active_handler = active.connect(
+            "state-changed",
+            lambda ac, state, reason: self._on_activation_state(bssid, state, reason),
         )
+        # The connection may have settled before the handler was connected
+        state = active.get_state()
+        if state in (
+            NM.ActiveConnectionState.ACTIVATED,
+            NM.ActiveConnectionState.DEACTIVATED,
+        ):
+            self._on_activation_state(bssid, state, active.get_state_reason())
+
+    def _on_activation_state(self, bssid: str, state, reason):
+        name = ACTIVE_CONNECTION_STATES.get(state, "unknown")
+        self.emit("connection-progress", bssid, name)
+        if state == NM.ActiveConnectionState.ACTIVATED:
+            self._finish_activation()
+            self.emit("connection-result", bssid, True, "")
+        elif state == NM.ActiveConnectionState.DEACTIVATED:
+            self._finish_activation()
+            message = NM.ActiveConnectionStateReason(reason).value_nick
+            self.emit("connection-result", bssid, False, message)
+
+    def _finish_activation(self):
+        if self._active_connection is not None and self._active_handler is not None:
+            self._active_connection.disconnect(self._active_handler)
+        self._active_connection = self._active_handler = None
+        self._activation = None
+
+    def cancel_connection(self):
+        if self._activation is None:
+            return
+        bssid, cancellable = self._activation
+        cancellable.cancel()
+        active = self._active_connection
+        self._finish_activation()
+        if active is not None and active.get_state() != NM.ActiveConnectionState.ACTIVATED:
+            self._client.deactivate_connection_async(active, None, None, None)
+        self.emit("connection-result", bssid, False, "Cancelled")
 
     @Property(str, "readable")
     def primary_device(self) -> Literal["wifi", "wired"] | None:
-        return self._get_primary_device()
\ No newline at end of file
+        return self._primary
\ No newline at end of file
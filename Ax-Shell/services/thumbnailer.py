@@ -0,0 +1,39 @@
+"""
+Thumbnail helpers of the wallpaper catalog, run on its worker threads.
+
+Hashing and GdkPixbuf decoding both release the GIL, so the workers run in
+parallel without a process pool.
+"""
+import hashlib
+import os
+import threading
+
+import gi
+
+gi.require_version("GdkPixbuf", "2.0")
+from gi.repository import GdkPixbuf  # noqa: E402
+
+THUMBNAIL_SIZE = 256
+
+
+def file_digest(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()[:32]
+
+
+def thumbnail_path(cache_dir: str, digest: str, size: int) -> str:
+    return os.path.join(cache_dir, "thumbnails", f"{digest}-{size}.png")
+
+
+def make_thumbnail(path: str, cache_dir: str, size: int = THUMBNAIL_SIZE):
+    """Hash `path` and write its thumbnail unless one exists, returns the digest."""
+    digest = file_digest(path)
+    target = thumbnail_path(cache_dir, digest, size)
+    if not os.path.exists(target):
+        # Decoding at scale lets the JPEG loader skip most of the full image
+        pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_scale(path, size, size, True)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        partial = f"{target}.{threading.get_ident()}.tmp"
+        pixbuf.savev(partial, "png", [], [])
+        os.replace(partial, target)
+    return digest
@@ -0,0 +1,182 @@
+import os
+import time
+from array import array
+
+from fabric.core.service import Property, Service, Signal
+from gi.repository import GLib
+from loguru import logger
+
+NET_ROOT = "/sys/class/net"
+
+# Sampling interval (ms) with and without subscribers
+ACTIVE_INTERVAL = 1000
+IDLE_INTERVAL = 10_000
+
+# Samples kept per interface, one per active interval. Idle samples only update
+# the rates, so every slot is ACTIVE_INTERVAL apart
+HISTORY_SIZE = 60
+
+# Ticks between two scans of NET_ROOT for new interfaces
+RESCAN_TICKS = 30
+
+
+class InterfaceCounters:
+    """Byte counters of one interface with a fixed-size rate history."""
+
+    __slots__ = (
+        "name",
+        "_fds",
+        "_last",
+        "_last_time",
+        "rx_rate",
+        "tx_rate",
+        "_rx",
+        "_tx",
+        "_head",
+    )
+
+    def __init__(self, root: str, name: str, size: int = HISTORY_SIZE):
+        self.name = name
+        stats = os.path.join(root, name, "statistics")
+        self._fds = (
+            os.open(os.path.join(stats, "rx_bytes"), os.O_RDONLY),
+            os.open(os.path.join(stats, "tx_bytes"), os.O_RDONLY),
+        )
+        self._last = self._read()
+        self._last_time = time.monotonic()
+        self.rx_rate = 0.0
+        self.tx_rate = 0.0
+        self._rx = array("d", bytes(8 * size))
+        self._tx = array("d", bytes(8 * size))
+        self._head = 0
+
+    def _read(self) -> tuple[int, int]:
+        return tuple(int(os.pread(fd, 32, 0)) for fd in self._fds)
+
+    def sample(self, record: bool = True):
+        now = time.monotonic()
+        current = self._read()
+        elapsed = now - self._last_time
+        if elapsed > 0:
+            # Counters can go backwards when a driver resets them
+            self.rx_rate = max(0, current[0] - self._last[0]) / elapsed
+            self.tx_rate = max(0, current[1] - self._last[1]) / elapsed
+        self._last, self._last_time = current, now
+        if not record:
+            return
+        self._rx[self._head] = self.rx_rate
+        self._tx[self._head] = self.tx_rate
+        self._head = (self._head + 1) % len(self._rx)
+
+    def reset_history(self):
+        for ring in (self._rx, self._tx):
+            for i in range(len(ring)):
+                ring[i] = 0.0
+        self._head = 0
+
+    def history(self) -> tuple[list[float], list[float]]:
+        # Oldest sample first
+        head = self._head
+        return (
+            self._rx[head:].tolist() + self._rx[:head].tolist(),
+            self._tx[head:].tolist() + self._tx[:head].tolist(),
+        )
+
+    def close(self):
+        for fd in self._fds:
+            os.close(fd)
+
+
+class TrafficMonitor(Service):
+    """A service sampling per-interface throughput on one shared timer."""
+
+    instance = None
+
+    @staticmethod
+    def get_initial():
+        if TrafficMonitor.instance is None:
+            TrafficMonitor.instance = TrafficMonitor()
+
+        return TrafficMonitor.instance
+
+    @Signal
+    def sampled(self) -> None: ...
+
+    def __init__(self, root: str = NET_ROOT, skip=("lo",), **kwargs):
+        super().__init__(**kwargs)
+        self._root = root
+        self._skip = set(skip)
+        self._interfaces: dict[str, InterfaceCounters] = {}
+        self._subscribers = 0
+        self._ticks = 0
+        self._timer: int | None = None
+        self._rescan()
+        self._schedule()
+
+    def _rescan(self):
+        try:
+            names = set(os.listdir(self._root)) - self._skip
+        except FileNotFoundError:
+            return
+        for name in names - self._interfaces.keys():
+            try:
+                self._interfaces[name] = InterfaceCounters(self._root, name)
+            except OSError as e:
+                logger.debug(f"[Traffic] Skipping {name}: {e}")
+        for name in self._interfaces.keys() - names:
+            self._interfaces.pop(name).close()
+
+    def _schedule(self):
+        if self._timer is not None:
+            GLib.source_remove(self._timer)
+        interval = ACTIVE_INTERVAL if self._subscribers else IDLE_INTERVAL
+        self._timer = GLib.timeout_add(interval, self._tick)
+
+    def _tick(self) -> bool:
+        self._ticks += 1
+        if self._ticks % RESCAN_TICKS == 0:
+            self._rescan()
+        active = self._subscribers > 0
+        for name, counters in list(self._interfaces.items()):
+            try:
+                counters.sample(record=active)
+            except (OSError, ValueError):
+                # The interface went away between two rescans
+                self._interfaces.pop(name).close()
+        self.notify("rates")
+        self.emit("sampled")
+        return True
+
+    def subscribe(self):
+        """Ask for full-rate sampling, pair with `unsubscribe`."""
+        self._subscribers += 1
+        if self._subscribers == 1:
+            # Start from fresh counters, history from before the idle gap would
+            # sit next to the new samples as if they were one interval apart
+            for counters in self._interfaces.values():
+                counters.reset_history()
+                try:
+                    counters.sample(record=False)
+                except (OSError, ValueError):
+                    pass
+            self._schedule()
+
+    def unsubscribe(self):
+        self._subscribers = max(0, self._subscribers - 1)
+        if self._subscribers == 0:
+            self._schedule()
+
+    def history(self, iface: str) -> tuple[list[float], list[float]]:
+        """rx and tx rates (bytes/s) of `iface`, oldest first, for sparklines."""
+        counters = self._interfaces.get(iface)
+        return counters.history() if counters else ([], [])
+
+    @Property(object, "readable")
+    def interfaces(self) -> list[str]:
+        return sorted(self._interfaces)
+
+    @Property(object, "readable")
+    def rates(self) -> dict[str, tuple[float, float]]:
+        return {
+            name: (c.rx_rate, c.tx_rate) for name, c in self._interfaces.items()
+        }
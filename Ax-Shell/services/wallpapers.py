@@ -0,0 +1,410 @@
+"""
+Wallpaper catalog.
+
+Keeps an index of WALLPAPER_DIR (.git excluded) current through inotify
+directory monitors, makes thumbnails on worker threads and runs matugen on
+every wallpaper in the background, so picking one reads cached results
+instead of scanning the tree, decoding full images and waiting on matugen.
+
+Cache layout under $XDG_CACHE_HOME/ax-shell/wallpapers:
+
+    manifest.json                   path -> [mtime_ns, size, digest]
+    thumbnails/<digest>-<size>.png
+    palettes/<digest>.json          `matugen --json hex` output
+
+Thumbnails and palettes are keyed by content, so a renamed or duplicated
+wallpaper reuses them; the manifest only saves rehashing unchanged files.
+"""
+import json
+import os
+import subprocess
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from fabric.core.service import Property, Service, Signal
+from gi.repository import Gio, GLib
+from loguru import logger
+
+import utils.functions as helpers
+from services.thumbnailer import THUMBNAIL_SIZE, make_thumbnail, thumbnail_path
+from utils.colors import Colors
+
+WALLPAPER_DIR = os.path.expanduser("~/Pictures/Wallpapers")
+
+CACHE_DIR = os.path.join(GLib.get_user_cache_dir(), "ax-shell", "wallpapers")
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".gif", ".bmp", ".tiff"}
+
+# Thumbnail threads; palettes run one matugen at a time
+WORKERS = 2
+
+# Same scheme wallpaperselect.sh asks matugen for
+MATUGEN_ARGS = ("--source-color-index", "0", "-t", "scheme-content")
+
+# Seconds of quiet before the manifest is written back
+MANIFEST_SAVE_DELAY = 2
+
+MONITOR_CREATED = (
+    Gio.FileMonitorEvent.CHANGES_DONE_HINT,
+    Gio.FileMonitorEvent.MOVED_IN,
+)
+MONITOR_REMOVED = (
+    Gio.FileMonitorEvent.DELETED,
+    Gio.FileMonitorEvent.MOVED_OUT,
+)
+
+
+def is_wallpaper(path: str) -> bool:
+    return os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS
+
+
+def palette_path(cache_dir: str, digest: str) -> str:
+    return os.path.join(cache_dir, "palettes", f"{digest}.json")
+
+
+def compute_palette(path: str, target: str):
+    # Runs on the matugen thread, at the lowest CPU priority
+    output = subprocess.run(
+        ["nice", "-n", "19", "matugen", "image", path, "--dry-run", "--json", "hex"]
+        + list(MATUGEN_ARGS),
+        capture_output=True,
+        text=True,
+        check=True,
+        timeout=120,
+    ).stdout
+    json.loads(output)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with open(f"{target}.tmp", "w") as f:
+        f.write(output)
+    os.replace(f"{target}.tmp", target)
+
+
+def source_color(palette) -> str | None:
+    # matugen has moved the key around between versions, look for it anywhere
+    if isinstance(palette, dict):
+        if isinstance(palette.get("source_color"), str):
+            return palette["source_color"]
+        values = palette.values()
+    elif isinstance(palette, list):
+        values = palette
+    else:
+        return None
+    for value in values:
+        if color := source_color(value):
+            return color
+    return None
+
+
+class Wallpaper:
+    __slots__ = ("path", "mtime_ns", "size", "digest")
+
+    def __init__(self, path: str, mtime_ns: int, size: int, digest: str | None):
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.digest = digest
+
+
+class WallpaperCatalog(Service):
+    """A service indexing the wallpapers, with cached thumbnails and palettes."""
+
+    instance = None
+
+    @staticmethod
+    def get_initial():
+        if WallpaperCatalog.instance is None:
+            WallpaperCatalog.instance = WallpaperCatalog()
+
+        return WallpaperCatalog.instance
+
+    @Signal
+    def changed(self) -> None: ...
+
+    @Signal
+    def thumbnail_ready(self, path: str, thumbnail: str) -> None: ...
+
+    @Signal
+    def palette_ready(self, path: str) -> None: ...
+
+    def __init__(
+        self,
+        root: str = WALLPAPER_DIR,
+        cache_dir: str = CACHE_DIR,
+        thumbnail_size: int = THUMBNAIL_SIZE,
+        precompute_palettes: bool = True,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self._root = root
+        self._cache_dir = cache_dir
+        self._thumbnail_size = thumbnail_size
+        self._entries: dict[str, Wallpaper] = {}
+        self._sorted: tuple[str, ...] = ()
+        self._monitors: dict[str, Gio.FileMonitor] = {}
+        self._manifest = self._load_manifest()
+        self._in_flight: set[str] = set()
+        self._palette_queue: deque[str] = deque()
+        self._palette_running = False
+        self._precompute = precompute_palettes
+        if precompute_palettes and not helpers.executable_exists("matugen"):
+            logger.warning(f"{Colors.WARNING}[Wallpapers] matugen not found")
+            self._precompute = False
+        self._pool = ThreadPoolExecutor(WORKERS, thread_name_prefix="thumbnails")
+        self._matugen = ThreadPoolExecutor(1, thread_name_prefix="matugen")
+        self._changed_id: int | None = None
+        self._save_id: int | None = None
+        self._scan(root)
+
+    # Index
+
+    def _scan(self, directory: str):
+        for dirpath, dirnames, filenames in os.walk(directory):
+            dirnames[:] = [d for d in dirnames if d != ".git"]
+            self._watch(dirpath)
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                if is_wallpaper(path):
+                    self._update(path)
+
+    def _watch(self, directory: str):
+        if directory in self._monitors:
+            return
+        try:
+            monitor = Gio.File.new_for_path(directory).monitor_directory(
+                Gio.FileMonitorFlags.WATCH_MOVES, None
+            )
+        except GLib.Error as e:
+            logger.warning(f"[Wallpapers] Can't watch {directory}: {e.message}")
+            return
+        monitor.connect("changed", self._on_monitor_event)
+        self._monitors[directory] = monitor
+
+    def _on_monitor_event(self, monitor, file: Gio.File, other, event):
+        path = file.get_path()
+        if event == Gio.FileMonitorEvent.RENAMED:
+            self._remove(path)
+            path, event = other.get_path(), Gio.FileMonitorEvent.MOVED_IN
+        if event in MONITOR_REMOVED:
+            self._remove(path)
+        elif event in MONITOR_CREATED or event == Gio.FileMonitorEvent.CREATED:
+            # Files are picked up once written, directories right away
+            if os.path.isdir(path):
+                if os.path.basename(path) != ".git":
+                    self._scan(path)
+            elif event in MONITOR_CREATED and is_wallpaper(path):
+                self._update(path)
+
+    def _update(self, path: str):
+        try:
+            st = os.stat(path)
+        except OSError:
+            self._remove(path)
+            return
+        entry = self._entries.get(path)
+        if entry and (entry.mtime_ns, entry.size) == (st.st_mtime_ns, st.st_size):
+            return
+        known = self._manifest.get(path)
+        digest = (
+            known[2] if known and known[:2] == [st.st_mtime_ns, st.st_size] else None
+        )
+        entry = self._entries[path] = Wallpaper(
+            path, st.st_mtime_ns, st.st_size, digest
+        )
+        self._queue_changed()
+        if digest is None or not os.path.exists(self._thumbnail_file(digest)):
+            self._make_thumbnail(entry)
+        else:
+            self._queue_palette(path)
+
+    def _remove(self, path: str):
+        prefix = path + os.sep
+        removed = [p for p in self._entries if p == path or p.startswith(prefix)]
+        for p in removed:
+            del self._entries[p]
+            self._manifest.pop(p, None)
+        for directory in list(self._monitors):
+            if directory == path or directory.startswith(prefix):
+                self._monitors.pop(directory).cancel()
+        if removed:
+            self._queue_changed()
+            self._queue_save()
+
+    def _queue_changed(self):
+        # Bulk copies and scans are published once per main-loop cycle
+        if self._changed_id is None:
+            self._changed_id = GLib.idle_add(self._emit_changed)
+
+    def _emit_changed(self):
+        self._changed_id = None
+        self._sorted = tuple(sorted(self._entries))
+        self.notify("wallpapers")
+        self.emit("changed")
+        return False
+
+    # Thumbnails
+
+    def _thumbnail_file(self, digest: str) -> str:
+        return thumbnail_path(self._cache_dir, digest, self._thumbnail_size)
+
+    def _make_thumbnail(self, entry: Wallpaper):
+        if entry.path in self._in_flight:
+            return
+        self._in_flight.add(entry.path)
+        future = self._pool.submit(
+            make_thumbnail, entry.path, self._cache_dir, self._thumbnail_size
+        )
+        future.add_done_callback(
+            lambda f, path=entry.path, mtime=entry.mtime_ns: GLib.idle_add(
+                self._on_thumbnail, path, mtime, f
+            )
+        )
+
+    def _on_thumbnail(self, path: str, mtime_ns: int, future: Future):
+        self._in_flight.discard(path)
+        entry = self._entries.get(path)
+        if entry is None:
+            return False
+        if entry.mtime_ns != mtime_ns:
+            # Rewritten while the worker was busy
+            self._make_thumbnail(entry)
+            return False
+        try:
+            entry.digest = future.result()
+        except Exception as e:
+            logger.warning(f"[Wallpapers] No thumbnail for {path}: {e}")
+            return False
+        self._manifest[path] = [entry.mtime_ns, entry.size, entry.digest]
+        self._queue_save()
+        self.emit("thumbnail_ready", path, self._thumbnail_file(entry.digest))
+        self._queue_palette(path)
+        return False
+
+    # Palettes
+
+    def _queue_palette(self, path: str):
+        if self._precompute:
+            self._palette_queue.append(path)
+            self._next_palette()
+
+    def _next_palette(self):
+        while self._palette_queue and not self._palette_running:
+            path = self._palette_queue.popleft()
+            entry = self._entries.get(path)
+            if entry is None or entry.digest is None:
+                continue
+            target = palette_path(self._cache_dir, entry.digest)
+            # Identical files share one palette
+            if os.path.exists(target):
+                continue
+            self._palette_running = True
+            future = self._matugen.submit(compute_palette, path, target)
+            future.add_done_callback(
+                lambda f, path=path: GLib.idle_add(self._on_palette, path, f)
+            )
+
+    def _on_palette(self, path: str, future: Future):
+        self._palette_running = False
+        try:
+            future.result()
+            self.emit("palette_ready", path)
+        except Exception as e:
+            logger.warning(f"[Wallpapers] matugen failed on {path}: {e}")
+        self._next_palette()
+        return False
+
+    # Manifest
+
+    def _load_manifest(self) -> dict:
+        try:
+            with open(os.path.join(self._cache_dir, "manifest.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _queue_save(self):
+        if self._save_id is None:
+            self._save_id = GLib.timeout_add_seconds(
+                MANIFEST_SAVE_DELAY, self._save_manifest
+            )
+
+    def _save_manifest(self):
+        self._save_id = None
+        path = os.path.join(self._cache_dir, "manifest.json")
+        try:
+            os.makedirs(self._cache_dir, exist_ok=True)
+            with open(f"{path}.tmp", "w") as f:
+                json.dump(self._manifest, f)
+            os.replace(f"{path}.tmp", path)
+        except OSError as e:
+            logger.warning(f"[Wallpapers] Can't save the manifest: {e}")
+        return False
+
+    # Public API
+
+    def thumbnail(self, path: str) -> str | None:
+        """Path of the cached thumbnail, None while it is still being made."""
+        entry = self._entries.get(path)
+        if entry is None or entry.digest is None:
+            return None
+        thumbnail = self._thumbnail_file(entry.digest)
+        if os.path.exists(thumbnail):
+            return thumbnail
+        self._make_thumbnail(entry)
+        return None
+
+    def palette(self, path: str) -> dict | None:
+        """The precomputed matugen output for a wallpaper, if there is one."""
+        entry = self._entries.get(path)
+        if entry is None or entry.digest is None:
+            return None
+        try:
+            with open(palette_path(self._cache_dir, entry.digest)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def apply(self, path: str):
+        """Set the wallpaper the way wallpaperselect.sh does, reusing the palette."""
+        home = os.path.expanduser("~")
+        with open(os.path.join(home, ".current_wall_path"), "w") as f:
+            f.write(f"{path}\n")
+        link = os.path.join(home, ".current.wall")
+        if os.path.lexists(link):
+            os.remove(link)
+        os.symlink(path, link)
+        Gio.Subprocess.new(
+            ["hyprctl", "dispatch", "global", "quickshell:updateWallpaper"],
+            Gio.SubprocessFlags.NONE,
+        )
+
+        # Regenerating the scheme from its source color skips the image pass
+        color = source_color(self.palette(path))
+        matugen = (
+            ["matugen", "color", "hex", color, "-t", "scheme-content"]
+            if color
+            else ["matugen", "image", path, *MATUGEN_ARGS]
+        )
+        Gio.Subprocess.new(
+            [
+                "sh",
+                "-c",
+                '"$@" && sh "$HOME/.config/hypr/scripts/colors_mqtt.sh"',
+                "sh",
+                *matugen,
+            ],
+            Gio.SubprocessFlags.NONE,
+        )
+
+    def close(self):
+        for monitor in self._monitors.values():
+            monitor.cancel()
+        self._monitors.clear()
+        if self._save_id is not None:
+            GLib.source_remove(self._save_id)
+            self._save_manifest()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._matugen.shutdown(wait=False, cancel_futures=True)
+
+    @Property(object, "readable")
+    def wallpapers(self) -> tuple[str, ...]:
+        return self._sorted